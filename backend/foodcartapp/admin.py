@@ -1,15 +1,20 @@
 from django.contrib import admin
+from django.db import transaction
 from django.shortcuts import redirect, reverse
 from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
+from .availability import set_menu_items_availability
+from .candidates import recompute_candidates
 from .models import Order
 from .models import OrderItem
+from .models import OrderProcessingTask
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
+from .orders_statistics import get_orders_statistics_rows, update_orders_statistics
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -34,6 +39,42 @@ class RestaurantAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(RestaurantMenuItem)
+class RestaurantMenuItemAdmin(admin.ModelAdmin):
+    list_display = [
+        'restaurant',
+        'product',
+        'availability',
+    ]
+    list_filter = [
+        'availability',
+        'restaurant',
+        'product__category',
+    ]
+    search_fields = [
+        'product__name',
+        'restaurant__name',
+    ]
+    list_select_related = [
+        'restaurant',
+        'product',
+    ]
+    actions = [
+        'make_available',
+        'make_unavailable',
+    ]
+
+    def make_available(self, request, queryset):
+        updated_count = set_menu_items_availability(queryset, True)
+        self.message_user(request, f'Возвращено в продажу пунктов меню: {updated_count}')
+    make_available.short_description = 'Вернуть в продажу'
+
+    def make_unavailable(self, request, queryset):
+        updated_count = set_menu_items_availability(queryset, False)
+        self.message_user(request, f'Снято с продажи пунктов меню: {updated_count}')
+    make_unavailable.short_description = 'Снять с продажи'
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = [
@@ -128,6 +169,7 @@ class OrderAdmin(admin.ModelAdmin):
         'firstname',
         'phonenumber',
         'address',
+        'total_cost',
     ]
     list_display_links = [
         'id',
@@ -141,11 +183,49 @@ class OrderAdmin(admin.ModelAdmin):
     readonly_fields = [
         'created',
         'phonenumber',
+        'total_cost',
+        'items_count',
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        orders = Order.objects.filter(pk=form.instance.pk)
+        previous_statistics_rows = get_orders_statistics_rows(orders)
+        orders.recalculate_totals()
+        update_orders_statistics(previous_statistics_rows, get_orders_statistics_rows(orders))
+        if 'address' in form.changed_data:
+            orders.update(candidates_updated_at=None)
+            OrderProcessingTask.objects.update_or_create(
+                order=form.instance,
+                defaults={'started_at': None, 'processed_at': None, 'attempts': 0, 'error': ''},
+            )
+        elif any(formset.has_changed() for formset in formsets) and form.instance.candidates_updated_at:
+            transaction.on_commit(lambda: recompute_candidates([form.instance.pk]))
+
     def response_change(self, request, obj):
         response = super().response_change(request, obj)
         if 'next' in request.GET and url_has_allowed_host_and_scheme(request.GET['next'], None):
             redirect_page = request.GET['next']
             return redirect(redirect_page)
         return response
+
+
+@admin.register(OrderProcessingTask)
+class OrderProcessingTaskAdmin(admin.ModelAdmin):
+    list_display = [
+        'order',
+        'created',
+        'processed_at',
+        'attempts',
+    ]
+    list_filter = [
+        'processed_at',
+    ]
+    readonly_fields = [
+        'order',
+        'created',
+        'started_at',
+        'processed_at',
+        'attempts',
+        'error',
+    ]
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Prefetch
+
+from .models import Order, OrderCandidateRestaurant
+from .orders_statistics import get_order_statistics_row, update_orders_statistics
+
+
+def choose_restaurants(orders_candidates, restaurants_load, load_penalty_km, max_load=None):
+    """Выбрать ресторан для каждого заказа с учётом расстояния и загрузки.
+
+    `orders_candidates` — пары `(заказ, [(ресторан, расстояние в км), ...])`
+    в порядке поступления заказов. Каждый открытый заказ ресторана добавляет
+    к расстоянию `load_penalty_km`; ресторанам с `max_load` открытых заказов
+    новые не назначаются. Загрузка учитывает и заказы, назначенные в этом же
+    вызове. Заказы без подходящего ресторана в результат не попадают.
+    """
+    restaurants_load = Counter(restaurants_load)
+    assignments = {}
+    for order, candidates in orders_candidates:
+        best_restaurant = best_score = None
+        for restaurant, restaurant_distance in candidates:
+            load = restaurants_load[restaurant]
+            if max_load and load >= max_load:
+                continue
+            score = restaurant_distance + load_penalty_km * load
+            if best_score is None or score < best_score:
+                best_restaurant, best_score = restaurant, score
+        if best_restaurant is not None:
+            assignments[order] = best_restaurant
+            restaurants_load[best_restaurant] += 1
+    return assignments
+
+
+def get_restaurants_load():
+    loaded_orders = (
+        Order.objects
+             .filter(status__in=[Order.UNWATCHED, Order.COOKING], cooking_restaurant__isnull=False)
+             .values('cooking_restaurant')
+             .annotate(orders_count=Count('id'))
+             .order_by()
+    )
+    return {
+        loaded_order['cooking_restaurant']: loaded_order['orders_count']
+        for loaded_order in loaded_orders
+    }
+
+
+def assign_restaurants(orders_ids=None, limit=None):
+    """Назначить ближайшие подходящие рестораны необработанным заказам без ресторана.
+
+    Загрузкой ресторана считаются назначенные ему заказы, которые ещё
+    готовятся или ждут звонка менеджера.
+    """
+    candidates = OrderCandidateRestaurant.objects.filter(distance__isnull=False).order_by('distance')
+    with transaction.atomic():
+        orders = (
+            Order.objects
+                 .filter(status=Order.UNWATCHED, cooking_restaurant__isnull=True)
+                 .select_for_update(skip_locked=True, of=('self',))
+                 .order_by('id')
+        )
+        if orders_ids is not None:
+            orders = orders.filter(id__in=orders_ids)
+        orders = list(orders[:limit].prefetch_related(Prefetch('candidate_restaurants', queryset=candidates)))
+
+        assignments = choose_restaurants(
+            [
+                (order, [(candidate.restaurant_id, candidate.distance) for candidate in order.candidate_restaurants.all()])
+                for order in orders
+            ],
+            get_restaurants_load(),
+            settings.ASSIGNMENT_LOAD_PENALTY_KM,
+            settings.ASSIGNMENT_MAX_RESTAURANT_LOAD,
+        )
+        previous_statistics_rows = [get_order_statistics_row(order) for order in assignments]
+        for order, restaurant_id in assignments.items():
+            order.cooking_restaurant_id = restaurant_id
+        Order.objects.bulk_update(list(assignments), ['cooking_restaurant'])
+        update_orders_statistics(previous_statistics_rows, [get_order_statistics_row(order) for order in assignments])
+    return assignments
@@ -0,0 +1,138 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .candidates import schedule_candidates_recomputation
+from .models import Restaurant, RestaurantMenuItem
+from .snapshots import invalidate_snapshot
+
+
+MENU_GENERATION_KEY = 'foodcartapp:menu_generation'
+AVAILABILITY_MATRIX_KEY = 'foodcartapp:availability_matrix:{}'
+
+availability_matrix_lock = threading.Lock()
+availability_matrix = None
+availability_matrix_generation = None
+
+
+def get_menu_generation():
+    """Поколение меню: все кэши, построенные по меню, помечены им.
+
+    Поколение само истекает через `DERIVED_CACHE_TIMEOUT`, так что даже с
+    кэшем в памяти процесса, где сбросы из других процессов не видны,
+    устаревшее меню живёт недолго.
+    """
+    return cache.get_or_set(MENU_GENERATION_KEY, uuid.uuid4().hex, timeout=settings.DERIVED_CACHE_TIMEOUT)
+
+
+def bump_menu_generation():
+    """Сделать устаревшими все кэши, построенные по меню ресторанов."""
+    cache.set(MENU_GENERATION_KEY, uuid.uuid4().hex, timeout=settings.DERIVED_CACHE_TIMEOUT)
+
+
+class AvailabilityMatrix:
+    """Наличие товаров в ресторанах: по битовой маске ресторанов на товар.
+
+    Бит ресторана — его позиция в списке `restaurants`, упорядоченном по названию.
+    Рестораны, способные приготовить весь заказ, получаются пересечением масок
+    товаров заказа, поэтому их поиск не зависит от размера меню.
+    """
+
+    def __init__(self, restaurants, menu_items):
+        self.restaurants = restaurants
+        positions = {restaurant_id: position for position, (restaurant_id, _) in enumerate(restaurants)}
+        self.products_masks = {}
+        for product_id, restaurant_id in menu_items:
+            # ресторан, созданный между чтением ресторанов и меню, попадёт в матрицу следующего поколения
+            if restaurant_id not in positions:
+                continue
+            self.products_masks[product_id] = self.products_masks.get(product_id, 0) | (1 << positions[restaurant_id])
+
+    @classmethod
+    def from_db(cls):
+        restaurants = list(Restaurant.objects.order_by('name', 'id').values_list('id', 'name'))
+        menu_items = RestaurantMenuItem.objects.filter(availability=True).values_list('product_id', 'restaurant_id')
+        return cls(restaurants, menu_items.iterator())
+
+    @property
+    def available_products_ids(self):
+        return self.products_masks.keys()
+
+    def get_product_availability(self, product_id):
+        mask = self.products_masks.get(product_id, 0)
+        return [bool(mask >> position & 1) for position in range(len(self.restaurants))]
+
+    def get_restaurants_ids(self, products_ids):
+        """Рестораны, где в продаже все товары из `products_ids`."""
+        mask = 0
+        for index, product_id in enumerate(products_ids):
+            product_mask = self.products_masks.get(product_id, 0)
+            mask = product_mask if not index else mask & product_mask
+            if not mask:
+                return []
+
+        restaurants_ids = []
+        while mask:
+            position = (mask & -mask).bit_length() - 1
+            restaurants_ids.append(self.restaurants[position][0])
+            mask &= mask - 1
+        return restaurants_ids
+
+    def get_restaurant_products_ids(self, restaurant_id):
+        position = next(
+            position for position, (matrix_restaurant_id, _) in enumerate(self.restaurants)
+            if matrix_restaurant_id == restaurant_id
+        )
+        return [product_id for product_id, mask in self.products_masks.items() if mask >> position & 1]
+
+
+def get_availability_matrix():
+    """Матрица наличия для текущего поколения меню.
+
+    Матрица хранится в кэше Django, общем для процессов, а последняя
+    полученная ещё и в памяти процесса, чтобы не загружать её из кэша
+    при каждом обращении.
+    """
+    global availability_matrix, availability_matrix_generation
+
+    generation = get_menu_generation()
+    with availability_matrix_lock:
+        if availability_matrix is not None and availability_matrix_generation == generation:
+            return availability_matrix
+
+    key = AVAILABILITY_MATRIX_KEY.format(generation)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = AvailabilityMatrix.from_db()
+        cache.set(key, matrix, settings.DERIVED_CACHE_TIMEOUT)
+    with availability_matrix_lock:
+        availability_matrix, availability_matrix_generation = matrix, generation
+    return matrix
+
+
+def get_available_products_ids():
+    return get_availability_matrix().available_products_ids
+
+
+def set_menu_items_availability(menu_items, availability):
+    """Включить или выключить наличие сразу многих пунктов меню.
+
+    Пункты обновляются одним `bulk_update`, который не вызывает сигналы
+    моделей, поэтому зависящие от меню кэши сбрасываются здесь же, один раз
+    после фиксации транзакции. Возвращает количество изменённых пунктов.
+    """
+    changed_menu_items = [menu_item for menu_item in menu_items if menu_item.availability != availability]
+    if not changed_menu_items:
+        return 0
+
+    for menu_item in changed_menu_items:
+        menu_item.availability = availability
+    with transaction.atomic():
+        RestaurantMenuItem.objects.bulk_update(changed_menu_items, ['availability'], batch_size=500)
+        transaction.on_commit(bump_menu_generation)
+        transaction.on_commit(lambda: invalidate_snapshot('products'))
+        schedule_candidates_recomputation(products_ids={menu_item.product_id for menu_item in changed_menu_items})
+    return len(changed_menu_items)
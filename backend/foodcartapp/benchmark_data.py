@@ -0,0 +1,67 @@
+import random
+
+from django.contrib.auth.models import User
+
+from .candidates import RECOMPUTE_CHUNK_SIZE, recompute_candidates
+from .models import Order, OrderItem, Product, Restaurant, RestaurantMenuItem
+from geocoder.models import Location
+
+
+def generate_benchmark_data(restaurants_count, products_count, orders_count, addresses_count,
+                            get_coordinates, seed=0):
+    """Наполнить пустую базу данными для бенчмарков.
+
+    Координаты всех адресов сразу сохраняются в `Location`, как на работающем
+    сайте, где адреса уже встречались. Возвращает менеджера и адреса доставки.
+    """
+    generator = random.Random(seed)
+
+    restaurants_addresses = [f'Москва, ресторан {number}' for number in range(restaurants_count)]
+    orders_addresses = [f'Москва, улица {number}, дом {number % 50 + 1}' for number in range(addresses_count)]
+    Location.objects.bulk_create([
+        Location(address=address, lat=lat, lon=lon)
+        for address in restaurants_addresses + orders_addresses
+        for lat, lon in [get_coordinates(address)]
+    ])
+
+    Restaurant.objects.bulk_create([
+        Restaurant(name=f'Star Burger {number}', address=address, lat=lat, lon=lon)
+        for number, address in enumerate(restaurants_addresses)
+        for lat, lon in [get_coordinates(address)]
+    ])
+    Product.objects.bulk_create([
+        Product(name=f'Бургер {number}', price=generator.randint(100, 500), image='burger.jpg')
+        for number in range(products_count)
+    ])
+    restaurants = list(Restaurant.objects.order_by('id'))
+    products = list(Product.objects.order_by('id'))
+    RestaurantMenuItem.objects.bulk_create([
+        RestaurantMenuItem(restaurant=restaurant, product=product, availability=generator.random() < 0.9)
+        for restaurant in restaurants
+        for product in products
+        if generator.random() < 0.8
+    ])
+
+    Order.objects.bulk_create([
+        Order(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79291234567',
+            address=generator.choice(orders_addresses),
+            status=generator.choice([Order.UNWATCHED, Order.UNWATCHED, Order.COOKING, Order.COMPLETED]),
+        )
+        for _ in range(orders_count)
+    ], batch_size=1000)
+    orders_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+    OrderItem.objects.bulk_create([
+        OrderItem(order_id=order_id, product=product, quantity=generator.randint(1, 3), price=product.price)
+        for order_id in orders_ids
+        for product in generator.sample(products, min(3, len(products)))
+    ], batch_size=1000)
+    Order.objects.recalculate_totals()
+
+    for start in range(0, len(orders_ids), RECOMPUTE_CHUNK_SIZE):
+        recompute_candidates(orders_ids[start:start + RECOMPUTE_CHUNK_SIZE])
+
+    manager = User.objects.create_user('manager', password='manager', is_staff=True)
+    return manager, orders_addresses
@@ -0,0 +1,153 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderCandidateRestaurant, OrderItem, Restaurant
+from .restaurants_grid import get_restaurants_grid
+from geocoder.distances import sort_by_distance
+from geocoder.locations_coordinates import find_locations_coordinates
+
+
+def get_orders_candidates(orders, availability_matrix, restaurants_grid, restaurants_coordinates):
+    orders_products_ids = defaultdict(list)
+    orders_items = OrderItem.objects.filter(order__in=orders).values_list('order_id', 'product_id')
+    for order_id, product_id in orders_items:
+        orders_products_ids[order_id].append(product_id)
+
+    candidates = []
+    for order in orders:
+        capable_restaurants_ids = set(availability_matrix.get_restaurants_ids(orders_products_ids[order.id]))
+        if order.lat is None or order.lon is None:
+            candidates.extend(
+                OrderCandidateRestaurant(order=order, restaurant_id=restaurant_id)
+                for restaurant_id in capable_restaurants_ids
+            )
+            continue
+
+        nearest_restaurants = restaurants_grid.nearest(
+            order.lat,
+            order.lon,
+            limit=settings.RESTAURANTS_SEARCH_LIMIT,
+            radius_km=settings.RESTAURANTS_SEARCH_RADIUS_KM,
+            allowed_keys=capable_restaurants_ids,
+        )
+        nearest_restaurants_ids = [restaurant_id for restaurant_id, _ in nearest_restaurants]
+        nearest_restaurants = sort_by_distance(
+            (order.lat, order.lon),
+            [restaurants_coordinates[restaurant_id] for restaurant_id in nearest_restaurants_ids],
+            [restaurant_distance for _, restaurant_distance in nearest_restaurants],
+            exact_top=settings.RESTAURANTS_EXACT_DISTANCE_TOP,
+        )
+        candidates.extend(
+            OrderCandidateRestaurant(
+                order=order,
+                restaurant_id=nearest_restaurants_ids[index],
+                distance=round(restaurant_distance, 3),
+            )
+            for index, restaurant_distance in nearest_restaurants
+        )
+    return candidates
+
+
+RECOMPUTE_CHUNK_SIZE = 500
+
+
+class GeocodingFailed(Exception):
+    def __init__(self, orders_ids):
+        super().__init__(f'Геокодер не ответил для заказов: {", ".join(map(str, orders_ids))}')
+        self.orders_ids = orders_ids
+
+
+def recompute_candidates(orders_ids, geocode=False):
+    """Заново подобрать рестораны, способные приготовить заказы.
+
+    Координаты заказа запрашиваются у геокодера, если рестораны для него ещё
+    не подбирались или передан `geocode=True` — например, после изменения
+    адреса в админке. Иначе используются сохранённые в заказе координаты.
+    Заказы, для адресов которых геокодер не ответил, остаются как были,
+    а после обработки остальных выбрасывается `GeocodingFailed`.
+    """
+    orders = list(Order.objects.filter(id__in=orders_ids).only('id', 'address', 'lat', 'lon', 'candidates_updated_at'))
+    if not orders:
+        return 0
+
+    failed_orders_ids = []
+    orders_to_geocode = [order for order in orders if geocode or order.candidates_updated_at is None]
+    if orders_to_geocode:
+        coordinates, failed_addresses = find_locations_coordinates({order.address for order in orders_to_geocode})
+        for order in orders_to_geocode:
+            order.lat, order.lon = coordinates[order.address]
+        failed_orders_ids = [order.id for order in orders_to_geocode if order.address in failed_addresses]
+        orders = [order for order in orders if order.id not in failed_orders_ids]
+
+    restaurants_coordinates = {
+        restaurant_id: (lat, lon)
+        for restaurant_id, lat, lon in Restaurant.objects.values_list('id', 'lat', 'lon')
+    }
+    from .availability import get_availability_matrix  # availability импортирует candidates
+
+    candidates = get_orders_candidates(
+        orders,
+        get_availability_matrix(),
+        get_restaurants_grid(),
+        restaurants_coordinates,
+    )
+
+    updated_at = timezone.now()
+    for order in orders:
+        order.candidates_updated_at = updated_at
+    with transaction.atomic():
+        # параллельный пересчёт тех же заказов ждёт здесь, иначе обе вставки нарушат unique_together
+        locked_orders = Order.objects.select_for_update().filter(id__in=[order.id for order in orders]).order_by('id')
+        list(locked_orders.values_list('id', flat=True))
+        OrderCandidateRestaurant.objects.filter(order__in=orders).delete()
+        OrderCandidateRestaurant.objects.bulk_create(candidates)
+        Order.objects.bulk_update(orders, ['lat', 'lon', 'candidates_updated_at'])
+    if failed_orders_ids:
+        raise GeocodingFailed(failed_orders_ids)
+    return len(orders)
+
+
+def get_orders_awaiting_restaurant():
+    return Order.objects.active().filter(cooking_restaurant__isnull=True)
+
+
+pending_changes = threading.local()
+
+
+def schedule_candidates_recomputation(products_ids=(), orders_ids=()):
+    """Пересчитать кандидатов для затронутых заказов после фиксации транзакции.
+
+    Изменения, накопленные за транзакцию, обрабатываются одним пересчётом:
+    первый же обработчик on_commit забирает их все, остальные ничего не делают.
+    """
+    if not hasattr(pending_changes, 'products_ids'):
+        pending_changes.products_ids = set()
+        pending_changes.orders_ids = set()
+    pending_changes.products_ids.update(products_ids)
+    pending_changes.orders_ids.update(orders_ids)
+    transaction.on_commit(flush_candidates_recomputation)
+
+
+def flush_candidates_recomputation():
+    products_ids = pending_changes.products_ids
+    orders_ids = pending_changes.orders_ids
+    if not products_ids and not orders_ids:
+        return
+    pending_changes.products_ids = set()
+    pending_changes.orders_ids = set()
+
+    if products_ids:
+        # заказы, ещё не прошедшие фоновую обработку, подберёт она сама вместе с геокодированием
+        orders_ids |= set(
+            get_orders_awaiting_restaurant()
+            .filter(candidates_updated_at__isnull=False, items__product_id__in=products_ids)
+            .values_list('id', flat=True)
+            .distinct()
+        )
+    orders_ids = sorted(orders_ids)
+    for start in range(0, len(orders_ids), RECOMPUTE_CHUNK_SIZE):
+        recompute_candidates(orders_ids[start:start + RECOMPUTE_CHUNK_SIZE])
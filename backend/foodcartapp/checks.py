@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [
+        Warning(
+            'Кэш Django хранится в памяти процесса: воркеры gunicorn и фоновые команды не видят сбросов кэша '
+            'друг друга и узнают об изменениях меню и ресторанов только через DERIVED_CACHE_TIMEOUT секунд.',
+            hint='Укажите в CACHE_URL общий кэш, например memcached или Redis.',
+            id='foodcartapp.W001',
+        ),
+    ]
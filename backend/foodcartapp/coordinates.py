@@ -0,0 +1,69 @@
+from django.db import transaction
+
+from .candidates import get_orders_awaiting_restaurant, schedule_candidates_recomputation
+from .models import Order, Restaurant, RestaurantMenuItem
+from .restaurants_grid import invalidate_restaurants_grid
+from geocoder.addresses import normalize_address
+from geocoder.models import Location
+
+
+def update_restaurants_coordinates(restaurants):
+    """Перенести в рестораны координаты из локаций их адресов.
+
+    Рестораны, для адресов которых локации ещё нет, остаются как были.
+    Возвращает количество ресторанов, чьи координаты изменились.
+    """
+    restaurants = list(restaurants.only('id', 'address', 'lat', 'lon'))
+    restaurants_keys = {restaurant.id: normalize_address(restaurant.address) for restaurant in restaurants}
+    locations = Location.objects.filter(key__in=set(restaurants_keys.values())).values_list('key', 'lat', 'lon')
+    keys_coordinates = {key: (lat, lon) for key, lat, lon in locations}
+
+    changed_restaurants = []
+    for restaurant in restaurants:
+        coordinates = keys_coordinates.get(restaurants_keys[restaurant.id])
+        if coordinates is not None and coordinates != (restaurant.lat, restaurant.lon):
+            restaurant.lat, restaurant.lon = coordinates
+            changed_restaurants.append(restaurant)
+    if not changed_restaurants:
+        return 0
+
+    with transaction.atomic():
+        Restaurant.objects.bulk_update(changed_restaurants, ['lat', 'lon'])
+        transaction.on_commit(invalidate_restaurants_grid)
+        products_ids = (
+            RestaurantMenuItem.objects
+                              .filter(restaurant__in=changed_restaurants)
+                              .values_list('product_id', flat=True)
+        )
+        schedule_candidates_recomputation(products_ids=set(products_ids))
+    return len(changed_restaurants)
+
+
+def update_orders_coordinates(addresses_keys):
+    """Перенести координаты локаций с ключами `addresses_keys` в заказы, которые ждут ресторана.
+
+    Обновляются только заказы, для которых рестораны уже подбирались:
+    остальные возьмут координаты сами при фоновой обработке. Рестораны
+    для обновлённых заказов подбираются заново. Возвращает их количество.
+    """
+    locations = Location.objects.filter(key__in=addresses_keys).values_list('key', 'lat', 'lon')
+    keys_coordinates = {key: (lat, lon) for key, lat, lon in locations}
+    orders = (
+        get_orders_awaiting_restaurant()
+        .filter(candidates_updated_at__isnull=False)
+        .only('id', 'address', 'lat', 'lon')
+    )
+
+    changed_orders = []
+    for order in orders.iterator():
+        coordinates = keys_coordinates.get(normalize_address(order.address))
+        if coordinates is not None and coordinates != (order.lat, order.lon):
+            order.lat, order.lon = coordinates
+            changed_orders.append(order)
+    if not changed_orders:
+        return 0
+
+    with transaction.atomic():
+        Order.objects.bulk_update(changed_orders, ['lat', 'lon'], batch_size=500)
+        schedule_candidates_recomputation(orders_ids=[order.id for order in changed_orders])
+    return len(changed_orders)
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .assignment import assign_restaurants
+from .candidates import GeocodingFailed, recompute_candidates
+from .models import OrderProcessingTask
+
+
+def claim_tasks(limit):
+    with transaction.atomic():
+        tasks_ids = list(
+            OrderProcessingTask.objects
+                               .pending()
+                               .select_for_update(skip_locked=True)
+                               .order_by('id')
+                               .values_list('id', flat=True)[:limit]
+        )
+        OrderProcessingTask.objects.filter(id__in=tasks_ids).update(
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+    return tasks_ids
+
+
+def process_tasks(tasks_ids):
+    """Обработать задачи.
+
+    Задачи заказов, для которых геокодер не ответил, остаются начатыми и
+    вернутся в очередь, как зависшие, через `ORDER_PROCESSING_TIMEOUT`:
+    так недоступный геокодер не расходует все попытки подряд.
+    """
+    tasks = OrderProcessingTask.objects.filter(id__in=tasks_ids)
+    orders = [task.order for task in tasks.select_related('order')]
+    try:
+        process_orders(orders)
+    except GeocodingFailed as error:
+        tasks.filter(order_id__in=error.orders_ids).update(error=repr(error))
+        tasks.exclude(order_id__in=error.orders_ids).update(processed_at=timezone.now(), error='')
+        raise
+    except Exception as error:
+        tasks.update(started_at=None, error=repr(error))
+        raise
+    tasks.update(processed_at=timezone.now(), error='')
+    return len(orders)
+
+
+def process_orders(orders):
+    """Подготовить новые заказы для менеджеров, пока их не открыли на странице заказов."""
+    orders_ids = [order.id for order in orders]
+    try:
+        recompute_candidates(orders_ids, geocode=True)
+    except GeocodingFailed as error:
+        if settings.AUTO_ASSIGN_RESTAURANTS:
+            assign_restaurants(sorted(set(orders_ids) - set(error.orders_ids)))
+        raise
+    if settings.AUTO_ASSIGN_RESTAURANTS:
+        assign_restaurants(orders_ids)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_restaurants
+
+
+class Command(BaseCommand):
+    help = 'Назначает рестораны необработанным заказам с учётом расстояния и загрузки ресторанов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='сколько заказов обработать за запуск')
+
+    def handle(self, *args, **options):
+        assignments = assign_restaurants(limit=options['limit'])
+        self.stdout.write(f'Назначено ресторанов: {len(assignments)}')
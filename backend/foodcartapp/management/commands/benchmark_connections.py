@@ -0,0 +1,93 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет накладные расходы на соединение с базой при текущих настройках: '
+        'прогоняет запросы к сайту через все middleware и считает новые подключения и SQL-запросы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        self.stdout.write(
+            f'{settings_dict["ENGINE"]}, CONN_MAX_AGE={settings_dict["CONN_MAX_AGE"]}, '
+            f'CONN_HEALTH_CHECKS={settings_dict.get("CONN_HEALTH_CHECKS", False)}, '
+            f'пул: {settings_dict.get("POOL", "нет")}'
+        )
+
+        handler = WSGIHandler()
+        # заказ с несуществующим товаром отклоняется после одного SQL-запроса и ничего не пишет в базу
+        order = json.dumps({
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291234567',
+            'address': 'Москва',
+            'products': [{'product': 2 ** 31 - 1, 'quantity': 1}],
+        })
+        self.benchmark_request(handler, 'GET', '/api/products/', '', options['requests'])
+        self.benchmark_request(handler, 'POST', '/api/order/', order, options['requests'])
+
+    def benchmark_request(self, handler, method, url, body, requests_count):
+        connections_count = queries_count = 0
+
+        def count_connection(**kwargs):
+            nonlocal connections_count
+            connections_count += 1
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries_count
+            queries_count += 1
+            return execute(sql, params, many, context)
+
+        connection_created.connect(count_connection)
+        connection.close()
+        durations = []
+        statuses = set()
+        for _ in range(requests_count):
+            started_at = time.perf_counter()
+            with connection.execute_wrapper(count_query):
+                environ = get_wsgi_environ(method, url, body)
+                response = handler(environ, lambda status, headers: statuses.add(status))
+                response.close()
+            durations.append(time.perf_counter() - started_at)
+        connection_created.disconnect(count_connection)
+
+        self.stdout.write(
+            f'{method} {url} ({", ".join(sorted(statuses))}): запросов {requests_count}, '
+            f'новых подключений к базе: {connections_count}, SQL-запросов: {queries_count}, '
+            f'время запроса: p50 {statistics.median(durations) * 1000:.2f} мс, '
+            f'среднее {statistics.mean(durations) * 1000:.2f} мс'
+        )
+
+
+def get_wsgi_environ(method, url, body):
+    body = body.encode()
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url,
+        'QUERY_STRING': '',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': '127.0.0.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
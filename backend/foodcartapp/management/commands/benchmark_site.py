@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from foodcartapp.benchmark_data import generate_benchmark_data
+from foodcartapp.models import Product
+from geocoder.locations_coordinates import coordinates_cache
+from geocoder.stub import StubGeocoderServer
+
+
+DEFAULT_BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и количество SQL-запросов витрины и страниц менеджера '
+        'на сгенерированных данных во временной базе и сравнивает с сохранёнными результатами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--products', type=int, default=300)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--addresses', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=50, help='сколько запросов делать к каждой странице')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH)
+        parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты как эталонные')
+        parser.add_argument(
+            '--latency-tolerance',
+            type=float,
+            default=0.5,
+            help='насколько p95 может превышать эталон, прежде чем считаться регрессией',
+        )
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            with StubGeocoderServer() as geocoder, override_settings(YANDEX_GEOCODER_URL=geocoder.url):
+                cache.clear()
+                coordinates_cache.clear()
+                results = self.run_benchmarks(geocoder, options)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]:.1f} мс, p95 {result["p95_ms"]:.1f} мс, '
+                f'p99 {result["p99_ms"]:.1f} мс, SQL-запросов до {result["max_queries"]}'
+            )
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, ensure_ascii=False, indent=2, sort_keys=True)
+                baseline_file.write('\n')
+            self.stdout.write(f'Результаты сохранены в {options["baseline"]}')
+            return
+
+        try:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+        except FileNotFoundError:
+            self.stdout.write('Эталонных результатов нет, сравнивать не с чем')
+            return
+
+        regressions = find_regressions(results, baseline, options['latency_tolerance'])
+        if regressions:
+            raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий нет')
+
+    def run_benchmarks(self, geocoder, options):
+        generator = random.Random(options['seed'])
+        manager, orders_addresses = generate_benchmark_data(
+            options['restaurants'],
+            options['products'],
+            options['orders'],
+            options['addresses'],
+            geocoder.get_coordinates,
+            seed=options['seed'],
+        )
+        products_ids = list(Product.objects.available().values_list('id', flat=True))
+
+        storefront_client = Client(HTTP_ACCEPT_ENCODING='gzip')
+        manager_client = Client()
+        manager_client.force_login(manager)
+
+        def register_order():
+            return storefront_client.post('/api/order/', {
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79291234567',
+                'address': generator.choice(orders_addresses),
+                'products': [
+                    {'product': product_id, 'quantity': generator.randint(1, 3)}
+                    for product_id in generator.sample(products_ids, min(3, len(products_ids)))
+                ],
+            }, content_type='application/json')
+
+        scenarios = {
+            'GET /api/products/': lambda: storefront_client.get('/api/products/'),
+            'POST /api/order/': register_order,
+            'GET /manager/orders/': lambda: manager_client.get('/manager/orders/'),
+            'GET /manager/products/': lambda: manager_client.get('/manager/products/'),
+        }
+        return {name: measure(request, options['requests']) for name, request in scenarios.items()}
+
+
+def measure(request, requests_count):
+    """Первый запрос не учитывается: он прогревает кэши."""
+    request()
+    durations = []
+    queries_counts = []
+    for _ in range(requests_count):
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            response = request()
+            durations.append(time.perf_counter() - started_at)
+        if response.status_code >= 400:
+            raise CommandError(f'Запрос завершился с ошибкой {response.status_code}')
+        queries_counts.append(len(queries))
+
+    percentiles = statistics.quantiles(durations, n=100, method='inclusive')
+    return {
+        'p50_ms': round(percentiles[49] * 1000, 1),
+        'p95_ms': round(percentiles[94] * 1000, 1),
+        'p99_ms': round(percentiles[98] * 1000, 1),
+        'max_queries': max(queries_counts),
+    }
+
+
+def find_regressions(results, baseline, latency_tolerance):
+    """Количество SQL-запросов сравнивается точно, время — с допуском: оно зависит от машины."""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result['max_queries'] > expected['max_queries']:
+            regressions.append(
+                f'{name}: SQL-запросов {result["max_queries"]}, в эталоне {expected["max_queries"]}'
+            )
+        if result['p95_ms'] > expected['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f'{name}: p95 {result["p95_ms"]:.1f} мс, в эталоне {expected["p95_ms"]:.1f} мс')
+    return regressions
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import GeocodingFailed, get_orders_awaiting_restaurant, recompute_candidates
+from foodcartapp.coordinates import update_restaurants_coordinates
+from foodcartapp.models import Order, Restaurant
+from geocoder.addresses import normalize_address
+from geocoder.locations_coordinates import find_locations_coordinates
+from geocoder.models import Location
+
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(settings.BASE_DIR, 'geocode_pending.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее геокодирует адреса заказов и ресторанов, которых ещё нет среди локаций. '
+        'Заказы просматриваются пачками по возрастанию id; после каждой пачки номер последнего '
+        'заказа и заказы, для которых геокодер не ответил, сохраняются, и следующий запуск '
+        'продолжает с них. Найденные координаты переносятся в рестораны без координат '
+        'и в заказы, которые ещё ждут ресторана'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH, help='файл с номером последнего заказа и неудавшимися заказами')
+        parser.add_argument('--from-start', action='store_true', help='просмотреть все заказы заново')
+
+    def handle(self, *args, **options):
+        last_order_id, failed_orders_ids = 0, []
+        if not options['from_start']:
+            last_order_id, failed_orders_ids = load_checkpoint(options['checkpoint'])
+        started_at = time.perf_counter()
+
+        report = geocode_missing_addresses(Restaurant.objects.values_list('address', flat=True))[0]
+        restaurants_count = update_restaurants_coordinates(Restaurant.objects.filter(lat__isnull=True))
+        scanned_orders_count = 0
+        retried_orders = list(Order.objects.filter(id__in=failed_orders_ids).order_by('id').values_list('id', 'address'))
+        failed_orders_ids = []
+        while True:
+            if retried_orders:
+                orders, retried_orders = retried_orders, []
+            else:
+                orders = list(
+                    Order.objects
+                         .filter(id__gt=last_order_id)
+                         .order_by('id')
+                         .values_list('id', 'address')[:options['batch_size']]
+                )
+                if not orders:
+                    break
+                last_order_id = orders[-1][0]
+
+            batch_report, failed_addresses = geocode_missing_addresses(address for _, address in orders)
+            report = {name: report[name] + batch_report[name] for name in report}
+            batch_failed_orders_ids = [order_id for order_id, address in orders if address in failed_addresses]
+            failed_orders_ids.extend(batch_failed_orders_ids)
+            failed_orders_ids.extend(update_orders_coordinates(set(dict(orders)) - set(batch_failed_orders_ids)))
+            scanned_orders_count += len(orders)
+            save_checkpoint(options['checkpoint'], last_order_id, failed_orders_ids)
+            if len(batch_failed_orders_ids) == len(orders):
+                self.stderr.write('Геокодер не ответил ни для одного заказа пачки, остальные заказы проверит следующий запуск')
+                break
+
+        duration = time.perf_counter() - started_at
+        self.stdout.write(
+            f'Просмотрено заказов: {scanned_orders_count}, последний заказ: {last_order_id}. '
+            f'Ресторанов получили координаты: {restaurants_count}. '
+            f'Геокодировано адресов: {report["geocoded"]}, не найдено: {report["not_found"]}, '
+            f'геокодер не ответил для заказов: {len(failed_orders_ids)}'
+        )
+        self.stdout.write(
+            f'Время: {duration:.1f} с, {scanned_orders_count / duration:.0f} заказов/с, '
+            f'{report["geocoded"] / duration:.1f} адресов/с'
+        )
+
+
+def geocode_missing_addresses(addresses):
+    """Геокодировать адреса, которых нет среди локаций; вернуть отчёт и адреса, для которых геокодер не ответил."""
+    addresses_keys = {address: normalize_address(address) for address in addresses if address}
+    known_keys = set(Location.objects.filter(key__in=set(addresses_keys.values())).values_list('key', flat=True))
+    missing_addresses = {}
+    for address, key in addresses_keys.items():
+        if key not in known_keys:
+            missing_addresses.setdefault(key, address)
+    report = {'geocoded': 0, 'not_found': 0}
+    if not missing_addresses:
+        return report, set()
+
+    coordinates, failed_addresses = find_locations_coordinates(missing_addresses.values())
+    for address, (lat, _) in coordinates.items():
+        if address not in failed_addresses:
+            report['geocoded' if lat is not None else 'not_found'] += 1
+    failed_keys = {normalize_address(address) for address in failed_addresses}
+    return report, {address for address, key in addresses_keys.items() if key in failed_keys}
+
+
+def update_orders_coordinates(orders_ids):
+    """Перенести координаты в заказы, которые ждут ресторана без координат; вернуть id неудавшихся."""
+    orders_ids = list(
+        get_orders_awaiting_restaurant()
+        .filter(id__in=orders_ids, lat__isnull=True)
+        .values_list('id', flat=True)
+    )
+    try:
+        recompute_candidates(orders_ids, geocode=True)
+    except GeocodingFailed as error:
+        return error.orders_ids
+    return []
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except FileNotFoundError:
+        return 0, []
+    return checkpoint['last_order_id'], checkpoint.get('failed_orders_ids', [])
+
+
+def save_checkpoint(path, last_order_id, failed_orders_ids):
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as checkpoint_file:
+        json.dump({'last_order_id': last_order_id, 'failed_orders_ids': failed_orders_ids}, checkpoint_file)
+    os.replace(temporary_path, path)
@@ -0,0 +1,62 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сайт параллельными запросами и выводит пропускную способность '
+        'и перцентили времени ответа; запустите против gunicorn и uvicorn, чтобы сравнить режимы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--path', action='append', help='страница для нагрузки; можно указать несколько раз')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/api/products/', '/api/banners/']
+        for path in paths:
+            report = asyncio.run(load(options['url'] + path, options['concurrency'], options['requests']))
+            if report['errors'] == options['requests']:
+                raise CommandError(f'{path}: все запросы завершились ошибкой')
+            self.stdout.write(
+                f'{path}: {report["throughput"]:.0f} запросов/с, p50 {report["p50_ms"]:.1f} мс, '
+                f'p95 {report["p95_ms"]:.1f} мс, p99 {report["p99_ms"]:.1f} мс, ошибок {report["errors"]}'
+            )
+
+
+async def load(url, concurrency, requests_count):
+    durations = []
+    errors = 0
+    remaining_requests = iter(range(requests_count))
+
+    async def send_requests(client):
+        nonlocal errors
+        for _ in remaining_requests:
+            started_at = time.perf_counter()
+            try:
+                response = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+            durations.append(time.perf_counter() - started_at)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*[send_requests(client) for _ in range(concurrency)])
+        duration = time.perf_counter() - started_at
+
+    percentiles = statistics.quantiles(durations, n=100, method='inclusive')
+    return {
+        'throughput': requests_count / duration,
+        'p50_ms': percentiles[49] * 1000,
+        'p95_ms': percentiles[94] * 1000,
+        'p99_ms': percentiles[98] * 1000,
+        'errors': errors,
+    }
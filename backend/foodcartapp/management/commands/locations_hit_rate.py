@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, Restaurant
+from geocoder.addresses import normalize_address
+from geocoder.models import Location
+
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, какая доля адресов заказов и ресторанов находится среди сохранённых локаций '
+        'по точному совпадению и по ключу адреса'
+    )
+
+    def handle(self, *args, **options):
+        addresses = set(Order.objects.values_list('address', flat=True).distinct().iterator())
+        addresses.update(Restaurant.objects.values_list('address', flat=True))
+        addresses = sorted(addresses)
+
+        exact_hits = key_hits = 0
+        for start in range(0, len(addresses), CHUNK_SIZE):
+            chunk = addresses[start:start + CHUNK_SIZE]
+            addresses_keys = {address: normalize_address(address) for address in chunk}
+            known_addresses = set(Location.objects.filter(address__in=chunk).values_list('address', flat=True))
+            known_keys = set(
+                Location.objects.filter(key__in=addresses_keys.values()).values_list('key', flat=True)
+            )
+            exact_hits += len(known_addresses)
+            key_hits += sum(key in known_keys for key in addresses_keys.values())
+
+        total = len(addresses) or 1
+        self.stdout.write(f'Адресов: {len(addresses)}, ключей: {len(set(map(normalize_address, addresses)))}')
+        self.stdout.write(f'Найдено по точному адресу: {exact_hits} ({exact_hits / total:.1%})')
+        self.stdout.write(f'Найдено по ключу адреса: {key_hits} ({key_hits / total:.1%})')
+        self.stdout.write(f'Потребуют запроса к геокодеру: {len(addresses) - key_hits}')
@@ -0,0 +1,59 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from foodcartapp.intake import claim_tasks, process_tasks
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает новые заказы в фоне: геокодирует адреса и готовит заказы для менеджеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='сколько процессов использовать; 0 — обрабатывать в этом процессе')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--poll-interval', type=float, default=1)
+        parser.add_argument('--once', action='store_true', help='обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        batch_size = options['batch_size']
+
+        executor = None
+        if workers:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+
+        try:
+            while True:
+                tasks_ids = claim_tasks(batch_size * max(workers, 1))
+                if not tasks_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                batches = [tasks_ids[start:start + batch_size] for start in range(0, len(tasks_ids), batch_size)]
+                if executor:
+                    futures = [executor.submit(process_tasks, batch) for batch in batches]
+                    results = [future.exception() or future.result() for future in futures]
+                else:
+                    results = []
+                    for batch in batches:
+                        try:
+                            results.append(process_tasks(batch))
+                        except Exception as error:
+                            results.append(error)
+
+                processed_count = sum(result for result in results if isinstance(result, int))
+                for error in (result for result in results if isinstance(result, Exception)):
+                    self.stderr.write(f'Ошибка обработки заказов: {error!r}')
+                self.stdout.write(f'Обработано заказов: {processed_count}')
+        finally:
+            if executor:
+                executor.shutdown()
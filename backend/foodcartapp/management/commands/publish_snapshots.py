@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.snapshots import SNAPSHOTS_DATA_GETTERS, publish_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Публикует сжатые снимки ответов API витрины'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f'какие снимки опубликовать: {", ".join(SNAPSHOTS_DATA_GETTERS)}')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(SNAPSHOTS_DATA_GETTERS)
+        unknown_names = set(names) - set(SNAPSHOTS_DATA_GETTERS)
+        if unknown_names:
+            raise CommandError(f'Неизвестные снимки: {", ".join(sorted(unknown_names))}')
+
+        for name in names:
+            snapshot = publish_snapshot(name)
+            sizes = ', '.join(
+                f'{encoding} {len(content)} байт' for encoding, content in snapshot['encodings'].items()
+            )
+            self.stdout.write(f'{name}: версия {snapshot["version"]}, {sizes}')
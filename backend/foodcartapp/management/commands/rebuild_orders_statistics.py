@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from foodcartapp.models import Order, OrderStatistics
+from foodcartapp.orders_statistics import (
+    STATISTICS_REBUILD_CHUNK_HOURS,
+    get_statistics_hour,
+    rebuild_orders_statistics,
+)
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает почасовую статистику заказов по самим заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-hours',
+            type=int,
+            default=STATISTICS_REBUILD_CHUNK_HOURS,
+            help='сколько часов пересчитывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        orders_bounds = Order.objects.order_by().aggregate(start=Min('created'), end=Max('created'))
+        statistics_bounds = OrderStatistics.objects.aggregate(start=Min('hour'), end=Max('hour'))
+        starts = [bound for bound in (orders_bounds['start'], statistics_bounds['start']) if bound]
+        ends = [bound for bound in (orders_bounds['end'], statistics_bounds['end']) if bound]
+        if not starts:
+            self.stdout.write('Заказов нет')
+            return
+
+        start = get_statistics_hour(min(starts))
+        end = get_statistics_hour(max(ends)) + datetime.timedelta(hours=1)
+        chunk = datetime.timedelta(hours=options['chunk_hours'])
+        hours_count = statistics_count = 0
+        while start < end:
+            chunk_end = min(start + chunk, end)
+            statistics_count += rebuild_orders_statistics(start, chunk_end)
+            hours_count += (chunk_end - start) // datetime.timedelta(hours=1)
+            start = chunk_end
+        self.stdout.write(f'Пересчитано часов: {hours_count}, строк статистики: {statistics_count}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import (
+    RECOMPUTE_CHUNK_SIZE,
+    GeocodingFailed,
+    get_orders_awaiting_restaurant,
+    recompute_candidates,
+)
+
+
+class Command(BaseCommand):
+    help = 'Подбирает рестораны для заказов, которым ещё не назначен ресторан'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='пересчитать и заказы, для которых рестораны уже подобраны')
+        parser.add_argument('--geocode', action='store_true', help='заново определить координаты адресов доставки')
+
+    def handle(self, *args, **options):
+        orders = get_orders_awaiting_restaurant()
+        if not options['all']:
+            orders = orders.filter(candidates_updated_at__isnull=True)
+        orders_ids = list(orders.order_by('id').values_list('id', flat=True))
+
+        failed_orders_ids = []
+        for start in range(0, len(orders_ids), RECOMPUTE_CHUNK_SIZE):
+            try:
+                recompute_candidates(orders_ids[start:start + RECOMPUTE_CHUNK_SIZE], geocode=options['geocode'])
+            except GeocodingFailed as error:
+                failed_orders_ids.extend(error.orders_ids)
+        self.stdout.write(f'Рестораны подобраны для заказов: {len(orders_ids) - len(failed_orders_ids)}')
+        if failed_orders_ids:
+            self.stderr.write(f'Геокодер не ответил, заказы пропущены: {len(failed_orders_ids)}')
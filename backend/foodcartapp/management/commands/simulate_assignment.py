@@ -0,0 +1,135 @@
+import heapq
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import choose_restaurants
+from geocoder.spatial_index import GridIndex
+
+
+class Command(BaseCommand):
+    help = 'Моделирует автоматическое назначение ресторанов на синтетических днях заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=3)
+        parser.add_argument('--orders-per-day', type=int, default=3000)
+        parser.add_argument('--restaurants', type=int, default=30)
+        parser.add_argument('--batch-minutes', type=int, default=1, help='как часто запускается назначение')
+        parser.add_argument('--cooking-minutes', type=int, default=30)
+        parser.add_argument('--menu-coverage', type=float, default=0.9, help='доля заказов, которые может приготовить ресторан')
+        parser.add_argument('--load-penalty-km', type=float, default=settings.ASSIGNMENT_LOAD_PENALTY_KM)
+        parser.add_argument('--max-load', type=int, default=settings.ASSIGNMENT_MAX_RESTAURANT_LOAD)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for title, load_penalty_km in [('Только расстояние', 0), ('С учётом загрузки', options['load_penalty_km'])]:
+            report = simulate(options, load_penalty_km)
+            self.stdout.write(f'\n{title} (штраф {load_penalty_km} км за заказ):')
+            self.stdout.write(
+                f'  назначено {report["assigned"]} из {report["orders"]}, '
+                f'время назначения пачки p50 {report["latency_p50"] * 1000:.2f} мс, '
+                f'p95 {report["latency_p95"] * 1000:.2f} мс, '
+                f'{report["latency_per_order"] * 1e6:.1f} мкс на заказ'
+            )
+            self.stdout.write(
+                f'  расстояние: среднее {report["distance_mean"]:.2f} км, p95 {report["distance_p95"]:.2f} км'
+            )
+            self.stdout.write(
+                f'  загрузка: максимум {report["load_max"]} заказов одновременно, '
+                f'разброс заказов по ресторанам (CV) {report["orders_cv"]:.2f}'
+            )
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def simulate(options, load_penalty_km):
+    generator = random.Random(options['seed'])
+    restaurants = [
+        (restaurant, generator.uniform(55.6, 55.9), generator.uniform(37.4, 37.8))
+        for restaurant in range(options['restaurants'])
+    ]
+    restaurants_grid = GridIndex(restaurants, cell_km=settings.RESTAURANTS_GRID_CELL_KM)
+    minutes_per_day = 24 * 60
+    batch_minutes = options['batch_minutes']
+
+    cooking_finishes = []
+    restaurants_load = Counter()
+    restaurants_orders = Counter()
+    latencies = []
+    distances = []
+    load_max = assigned_count = orders_count = 0
+
+    for day in range(options['days']):
+        orders_minutes = sorted(
+            generator.triangular(10 * 60, 23 * 60, 13 * 60) for _ in range(options['orders_per_day'])
+        )
+        waiting_orders = []
+        orders_minutes_iterator = iter(orders_minutes)
+        next_order_minute = next(orders_minutes_iterator, None)
+
+        for minute in range(0, minutes_per_day, batch_minutes):
+            now = day * minutes_per_day + minute
+            while cooking_finishes and cooking_finishes[0][0] <= now:
+                _, restaurant = heapq.heappop(cooking_finishes)
+                restaurants_load[restaurant] -= 1
+
+            while next_order_minute is not None and next_order_minute < minute + batch_minutes:
+                lat, lon = generator.uniform(55.6, 55.9), generator.uniform(37.4, 37.8)
+                candidates = [
+                    (restaurant, restaurant_distance)
+                    for restaurant, restaurant_distance in restaurants_grid.nearest(
+                        lat,
+                        lon,
+                        limit=settings.RESTAURANTS_SEARCH_LIMIT,
+                        radius_km=settings.RESTAURANTS_SEARCH_RADIUS_KM,
+                    )
+                    if generator.random() < options['menu_coverage']
+                ]
+                waiting_orders.append((orders_count, candidates))
+                orders_count += 1
+                next_order_minute = next(orders_minutes_iterator, None)
+
+            if not waiting_orders:
+                continue
+
+            started_at = time.perf_counter()
+            assignments = choose_restaurants(waiting_orders, restaurants_load, load_penalty_km, options['max_load'])
+            latencies.append((time.perf_counter() - started_at, len(waiting_orders)))
+
+            orders_distances = dict(
+                (order, dict(candidates)) for order, candidates in waiting_orders if order in assignments
+            )
+            for order, restaurant in assignments.items():
+                distances.append(orders_distances[order][restaurant])
+                restaurants_load[restaurant] += 1
+                restaurants_orders[restaurant] += 1
+                heapq.heappush(cooking_finishes, (now + options['cooking_minutes'], restaurant))
+            assigned_count += len(assignments)
+            load_max = max(load_max, max(restaurants_load.values(), default=0))
+            waiting_orders = [
+                (order, candidates) for order, candidates in waiting_orders
+                if order not in assignments and candidates
+            ]
+
+    orders_per_restaurant = [restaurants_orders[restaurant] for restaurant, _, _ in restaurants]
+    orders_mean = statistics.mean(orders_per_restaurant) if orders_per_restaurant else 0
+    return {
+        'orders': orders_count,
+        'assigned': assigned_count,
+        'latency_p50': percentile([latency for latency, _ in latencies], 0.5),
+        'latency_p95': percentile([latency for latency, _ in latencies], 0.95),
+        'latency_per_order': sum(latency for latency, _ in latencies) / max(sum(size for _, size in latencies), 1),
+        'distance_mean': statistics.mean(distances) if distances else 0,
+        'distance_p95': percentile(distances, 0.95),
+        'load_max': load_max,
+        'orders_cv': statistics.pstdev(orders_per_restaurant) / orders_mean if orders_mean else 0,
+    }
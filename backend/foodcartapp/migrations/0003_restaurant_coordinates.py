@@ -0,0 +1,41 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+def fill_restaurants_coordinates(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    Location = apps.get_model('geocoder', 'Location')
+
+    restaurants = list(Restaurant.objects.all())
+    locations = Location.objects.in_bulk(
+        [restaurant.address for restaurant in restaurants],
+        field_name='address',
+    )
+    for restaurant in restaurants:
+        location = locations.get(restaurant.address)
+        if location:
+            restaurant.lat, restaurant.lon = location.lat, location.lon
+    Restaurant.objects.bulk_update(restaurants, ['lat', 'lon'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0002_order_active_status_id_idx'),
+        ('geocoder', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='lat',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='широта'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='lon',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='долгота'),
+        ),
+        migrations.RunPython(fill_restaurants_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0003_restaurant_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderProcessingTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='время создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='время начала обработки')),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='время окончания обработки')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток обработки')),
+                ('error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='processing_task', to='foodcartapp.order', verbose_name='заказ')),
+            ],
+            options={
+                'verbose_name': 'задача обработки заказа',
+                'verbose_name_plural': 'задачи обработки заказов',
+            },
+        ),
+    ]
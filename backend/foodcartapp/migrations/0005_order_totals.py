@@ -0,0 +1,42 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:19
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_orders_totals(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_cost=Coalesce(
+            Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')),
+            Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        items_count=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0004_orderprocessingtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='количество товаров'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='стоимость заказа'),
+        ),
+        migrations.RunPython(fill_orders_totals, migrations.RunPython.noop),
+    ]
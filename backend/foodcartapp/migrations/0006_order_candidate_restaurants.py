@@ -0,0 +1,50 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0005_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='candidates_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='время подбора ресторанов'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lat',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='широта'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lon',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='долгота'),
+        ),
+        migrations.CreateModel(
+            name='OrderCandidateRestaurant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(blank=True, null=True, verbose_name='расстояние до клиента, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_restaurants', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_orders', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'ресторан-кандидат для заказа',
+                'verbose_name_plural': 'рестораны-кандидаты для заказов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ordercandidaterestaurant',
+            index=models.Index(fields=['order', 'distance'], name='foodcartapp_order_i_6df200_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ordercandidaterestaurant',
+            unique_together={('order', 'restaurant')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0006_order_candidate_restaurants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True, verbose_name='час')),
+                ('status', models.CharField(choices=[('1', 'Необработанный'), ('2', 'Готовится'), ('3', 'Доставляется'), ('4', 'Выполнен')], max_length=2, verbose_name='статус')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='количество заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='стоимость заказов')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders_statistics', to='foodcartapp.restaurant', verbose_name='какой ресторан готовит')),
+            ],
+            options={
+                'verbose_name': 'статистика заказов за час',
+                'verbose_name_plural': 'статистика заказов по часам',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatistics',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', False)), fields=('hour', 'restaurant', 'status'), name='order_statistics_restaurant_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatistics',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('hour', 'status'), name='order_statistics_no_restaurant_uniq'),
+        ),
+    ]
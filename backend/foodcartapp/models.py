@@ -1,6 +1,11 @@
+import datetime
+
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import F
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
 
@@ -19,6 +24,8 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    lat = models.FloatField('широта', null=True, blank=True, editable=False)
+    lon = models.FloatField('долгота', null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'ресторан'
@@ -29,13 +36,23 @@ class Restaurant(models.Model):
 
 
 class ProductQuerySet(models.QuerySet):
-    def available(self):
-        products = (
-            RestaurantMenuItem.objects
-                              .filter(availability=True)
-                              .values_list('product')
-        )
-        return self.filter(pk__in=products)
+    def available(self, from_db=False):
+        """Товары, которые есть в продаже хотя бы в одном ресторане.
+
+        По умолчанию наличие берётся из кэшированной матрицы наличия, а с
+        `from_db=True` — подзапросом к меню в БД, как того требует проверка заказа.
+        """
+        if from_db:
+            products = (
+                RestaurantMenuItem.objects
+                                  .filter(availability=True)
+                                  .values_list('product')
+            )
+            return self.filter(pk__in=products)
+
+        from .availability import get_available_products_ids  # availability импортирует модели
+
+        return self.filter(pk__in=list(get_available_products_ids()))
 
 
 class ProductCategory(models.Model):
@@ -120,6 +137,22 @@ class RestaurantMenuItem(models.Model):
         return f'{self.restaurant.name} - {self.product.name}'
 
 
+class OrderQuerySet(models.QuerySet):
+    def active(self):
+        return self.exclude(status=Order.COMPLETED)
+
+    def recalculate_totals(self):
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.update(
+            total_cost=Coalesce(
+                Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')),
+                Value(0),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            items_count=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), Value(0)),
+        )
+
+
 class Order(models.Model):
     """Заказ."""
 
@@ -162,6 +195,14 @@ class Order(models.Model):
     phonenumber = PhoneNumberField('телефон', max_length=255, db_index=True)
     address = models.CharField('адрес', max_length=255)
     comment = models.TextField('комментарий', blank=True)
+    total_cost = models.DecimalField(
+        'стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)],
+    )
+    items_count = models.PositiveIntegerField('количество товаров', default=0)
 
     cooking_restaurant = models.ForeignKey(
         Restaurant,
@@ -171,11 +212,28 @@ class Order(models.Model):
         blank=True,
         on_delete=models.PROTECT,
     )
+    lat = models.FloatField('широта', null=True, blank=True, editable=False)
+    lon = models.FloatField('долгота', null=True, blank=True, editable=False)
+    candidates_updated_at = models.DateTimeField(
+        'время подбора ресторанов',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(
+                fields=['status', 'id'],
+                name='order_active_status_id_idx',
+                condition=~Q(status='4'),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.id}. {self.created} {self.firstname} {self.lastname}, телефон {self.phonenumber}'
@@ -218,3 +276,103 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = 'элемент заказа'
         verbose_name_plural = 'элементы заказа'
+
+
+class OrderCandidateRestaurant(models.Model):
+    """Ресторан, который может приготовить заказ целиком."""
+
+    order = models.ForeignKey(
+        Order,
+        related_name='candidate_restaurants',
+        verbose_name='заказ',
+        on_delete=models.CASCADE,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='candidate_orders',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE,
+    )
+    distance = models.FloatField('расстояние до клиента, км', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'ресторан-кандидат для заказа'
+        verbose_name_plural = 'рестораны-кандидаты для заказов'
+        unique_together = [['order', 'restaurant']]
+        indexes = [
+            models.Index(fields=['order', 'distance']),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} - {self.restaurant_id}: {self.distance} км'
+
+
+class OrderProcessingTaskQuerySet(models.QuerySet):
+    def pending(self):
+        stalled_before = timezone.now() - datetime.timedelta(seconds=settings.ORDER_PROCESSING_TIMEOUT)
+        return self.filter(
+            Q(started_at__isnull=True) | Q(started_at__lt=stalled_before),
+            processed_at__isnull=True,
+            attempts__lt=settings.ORDER_PROCESSING_MAX_ATTEMPTS,
+        )
+
+
+class OrderProcessingTask(models.Model):
+    """Задача фоновой обработки нового заказа."""
+
+    order = models.OneToOneField(
+        Order,
+        related_name='processing_task',
+        verbose_name='заказ',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField('время создания', auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField('время начала обработки', null=True, blank=True)
+    processed_at = models.DateTimeField('время окончания обработки', null=True, blank=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField('попыток обработки', default=0)
+    error = models.TextField('последняя ошибка', blank=True)
+
+    objects = OrderProcessingTaskQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'задача обработки заказа'
+        verbose_name_plural = 'задачи обработки заказов'
+
+    def __str__(self):
+        return f'Обработка заказа {self.order_id}'
+
+
+class OrderStatistics(models.Model):
+    """Количество и стоимость заказов за час в разрезе ресторана и статуса."""
+
+    hour = models.DateTimeField('час', db_index=True)
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='orders_statistics',
+        verbose_name='какой ресторан готовит',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField('статус', max_length=2, choices=Order.ORDER_STATUSES)
+    orders_count = models.IntegerField('количество заказов', default=0)
+    revenue = models.DecimalField('стоимость заказов', max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'статистика заказов за час'
+        verbose_name_plural = 'статистика заказов по часам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'restaurant', 'status'],
+                name='order_statistics_restaurant_uniq',
+                condition=Q(restaurant__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=['hour', 'status'],
+                name='order_statistics_no_restaurant_uniq',
+                condition=Q(restaurant__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.hour} {self.restaurant_id} {self.get_status_display()}: {self.orders_count}'
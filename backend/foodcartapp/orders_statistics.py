@@ -0,0 +1,97 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+
+from .models import Order, OrderStatistics
+
+
+STATISTICS_REBUILD_CHUNK_HOURS = 24
+
+
+def get_statistics_hour(created):
+    return created.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def get_order_statistics_row(order):
+    key = get_statistics_hour(order.created), order.cooking_restaurant_id, order.status
+    return key, order.total_cost
+
+
+def get_orders_statistics_rows(orders):
+    orders = orders.values_list('created', 'cooking_restaurant_id', 'status', 'total_cost')
+    return [
+        ((get_statistics_hour(created), restaurant_id, status), total_cost)
+        for created, restaurant_id, status, total_cost in orders
+    ]
+
+
+def update_orders_statistics(previous_rows, rows):
+    """Перенести заказы в статистике из прежних строк в новые после фиксации транзакции.
+
+    Каждый новый заказ меняет одну и ту же строку текущего часа, поэтому
+    она обновляется уже после фиксации, а не держит блокировку всю транзакцию
+    оформления заказа. Если процесс упадёт между фиксацией и обновлением,
+    статистику поправит команда `rebuild_orders_statistics`.
+    """
+    changes = defaultdict(lambda: [0, Decimal(0)])
+    for key, revenue in previous_rows:
+        changes[key][0] -= 1
+        changes[key][1] -= revenue
+    for key, revenue in rows:
+        changes[key][0] += 1
+        changes[key][1] += revenue
+
+    changes = {key: change for key, change in changes.items() if any(change)}
+    if changes:
+        transaction.on_commit(lambda: apply_statistics_changes(changes))
+
+
+def apply_statistics_changes(changes):
+    # строки блокируются в одном порядке, чтобы параллельные обновления не взаимоблокировались
+    for key in sorted(changes, key=lambda key: (key[0], key[1] or 0, key[2])):
+        hour, restaurant_id, status = key
+        orders_count, revenue = changes[key]
+        statistics = OrderStatistics.objects.filter(hour=hour, restaurant_id=restaurant_id, status=status)
+        change = {'orders_count': F('orders_count') + orders_count, 'revenue': F('revenue') + revenue}
+        if not statistics.update(**change):
+            try:
+                with transaction.atomic():
+                    OrderStatistics.objects.create(
+                        hour=hour,
+                        restaurant_id=restaurant_id,
+                        status=status,
+                        orders_count=orders_count,
+                        revenue=revenue,
+                    )
+            except IntegrityError:
+                statistics.update(**change)
+        if orders_count < 0:
+            statistics.filter(orders_count=0).delete()
+
+
+def rebuild_orders_statistics(start, end):
+    """Пересчитать статистику по самим заказам за часы с `start` до `end`."""
+    orders_statistics = (
+        Order.objects
+             .filter(created__gte=start, created__lt=end)
+             .annotate(hour=TruncHour('created', tzinfo=datetime.timezone.utc))
+             .values('hour', 'cooking_restaurant', 'status')
+             .annotate(orders_count=Count('id'), revenue=Sum('total_cost'))
+             .order_by()
+    )
+    with transaction.atomic():
+        OrderStatistics.objects.filter(hour__gte=start, hour__lt=end).delete()
+        return len(OrderStatistics.objects.bulk_create(
+            OrderStatistics(
+                hour=statistics['hour'],
+                restaurant_id=statistics['cooking_restaurant'],
+                status=statistics['status'],
+                orders_count=statistics['orders_count'],
+                revenue=statistics['revenue'],
+            )
+            for statistics in orders_statistics
+        ))
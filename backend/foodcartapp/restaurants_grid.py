@@ -0,0 +1,44 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Restaurant
+from geocoder.spatial_index import GridIndex
+
+
+RESTAURANTS_GRID_VERSION_KEY = 'foodcartapp:restaurants_grid_version'
+
+restaurants_grid_lock = threading.Lock()
+restaurants_grid = None
+restaurants_grid_version = None
+
+
+def get_restaurants_grid():
+    """Пространственный индекс ресторанов, общий для всех запросов процесса.
+
+    Индекс перестраивается, когда номер версии в кэше Django отличается от
+    номера, с которым он был построен. Версия истекает через
+    `DERIVED_CACHE_TIMEOUT`, так что даже с кэшем в памяти процесса
+    изменения ресторанов доходят до всех процессов.
+    """
+    global restaurants_grid, restaurants_grid_version
+
+    version = cache.get_or_set(
+        RESTAURANTS_GRID_VERSION_KEY,
+        uuid.uuid4().hex,
+        timeout=settings.DERIVED_CACHE_TIMEOUT,
+    )
+    with restaurants_grid_lock:
+        if restaurants_grid is None or restaurants_grid_version != version:
+            restaurants_grid = GridIndex(
+                Restaurant.objects.values_list('id', 'lat', 'lon'),
+                cell_km=settings.RESTAURANTS_GRID_CELL_KM,
+            )
+            restaurants_grid_version = version
+        return restaurants_grid
+
+
+def invalidate_restaurants_grid():
+    cache.set(RESTAURANTS_GRID_VERSION_KEY, uuid.uuid4().hex, timeout=settings.DERIVED_CACHE_TIMEOUT)
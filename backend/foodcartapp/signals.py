@@ -0,0 +1,107 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import bump_menu_generation
+from .candidates import schedule_candidates_recomputation
+from .coordinates import update_orders_coordinates, update_restaurants_coordinates
+from .models import Order, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .orders_statistics import get_order_statistics_row, get_orders_statistics_rows, update_orders_statistics
+from .restaurants_grid import invalidate_restaurants_grid
+from .snapshots import invalidate_snapshot
+from geocoder.locations_coordinates import find_locations_coordinates
+from geocoder.signals import locations_refreshed
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Restaurant)
+def update_restaurant_coordinates(sender, instance, raw=False, **kwargs):
+    """Геокодировать новый адрес ресторана или адрес, для которого координат ещё нет.
+
+    Если геокодер не ответил, координаты остаются пустыми: ресторан ждёт
+    следующего сохранения или команды `geocode_pending`, которая их заполнит.
+    """
+    if raw:
+        return
+    if instance.pk:
+        previous_address = Restaurant.objects.filter(pk=instance.pk).values_list('address', flat=True).first()
+        if previous_address == instance.address and instance.lat is not None:
+            return
+    coordinates, failed_addresses = find_locations_coordinates([instance.address])
+    if instance.address in failed_addresses:
+        logger.warning('Геокодер не ответил для адреса ресторана %r, координаты заполнит geocode_pending', instance.address)
+        instance.lat = instance.lon = None
+        return
+    instance.lat, instance.lon = coordinates[instance.address]
+    instance.coordinates_changed = True
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_menu_caches(sender, **kwargs):
+    bump_menu_generation()
+    # ещё раз после фиксации: другой процесс мог успеть собрать кэш по данным до неё;
+    # обработчик подключён раньше пересчёта кандидатов, чтобы тот взял уже новое наличие
+    transaction.on_commit(bump_menu_generation)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant_indexes(sender, instance, **kwargs):
+    invalidate_restaurants_grid()
+    # ещё раз после фиксации: другой процесс мог успеть собрать индекс по данным до неё
+    transaction.on_commit(invalidate_restaurants_grid)
+    if getattr(instance, 'coordinates_changed', False):
+        products_ids = RestaurantMenuItem.objects.filter(restaurant=instance).values_list('product_id', flat=True)
+        schedule_candidates_recomputation(products_ids=list(products_ids))
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def recompute_menu_item_candidates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_candidates_recomputation(products_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_products_snapshot(sender, **kwargs):
+    invalidate_snapshot('products')
+    # ещё раз после фиксации: запрос до неё мог собрать снимок по старым данным
+    transaction.on_commit(lambda: invalidate_snapshot('products'))
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_statistics_row(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance.previous_statistics_rows = get_orders_statistics_rows(Order.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Order)
+def update_order_statistics(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_orders_statistics(
+            getattr(instance, 'previous_statistics_rows', []),
+            [get_order_statistics_row(instance)],
+        )
+
+
+@receiver(post_delete, sender=Order)
+def discount_order_statistics(sender, instance, **kwargs):
+    update_orders_statistics([get_order_statistics_row(instance)], [])
+
+
+@receiver(locations_refreshed)
+def update_refreshed_coordinates(sender, addresses_keys, **kwargs):
+    update_restaurants_coordinates(Restaurant.objects.all())
+    update_orders_coordinates(addresses_keys)
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils import timezone
+
+from .models import Product
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+SNAPSHOT_CACHE_KEY = 'foodcartapp:snapshot:{}'
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def get_products_data():
+    products = Product.objects.select_related('category').available()
+    return [serialize_product(product) for product in products]
+
+
+def get_banners_data():
+    # FIXME move data to db?
+    return [
+        {
+            'title': 'Burger',
+            'src': static('burger.jpg'),
+            'text': 'Tasty Burger at your door step',
+        },
+        {
+            'title': 'Spices',
+            'src': static('food.jpg'),
+            'text': 'All Cuisines',
+        },
+        {
+            'title': 'New York',
+            'src': static('tasty.jpg'),
+            'text': 'Food is incomplete without a tasty dessert',
+        }
+    ]
+
+
+SNAPSHOTS_DATA_GETTERS = {
+    'products': get_products_data,
+    'banners': get_banners_data,
+}
+
+
+def build_snapshot(data):
+    content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    encodings = {
+        'identity': content,
+        'gzip': gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    if brotli:
+        encodings['br'] = brotli.compress(content)
+    return {
+        'version': hashlib.sha1(content).hexdigest()[:16],
+        'last_modified': int(timezone.now().timestamp()),
+        'encodings': encodings,
+    }
+
+
+def publish_snapshot(name):
+    snapshot = build_snapshot(SNAPSHOTS_DATA_GETTERS[name]())
+    cache.set(SNAPSHOT_CACHE_KEY.format(name), snapshot, timeout=settings.DERIVED_CACHE_TIMEOUT)
+    return snapshot
+
+
+def get_snapshot(name):
+    """Готовый к отправке JSON API в исходном и сжатом виде.
+
+    Снимок собирается один раз и хранится в кэше Django, пока данные не
+    изменятся, но не дольше `DERIVED_CACHE_TIMEOUT`; после `invalidate_snapshot`
+    его заново опубликует первый же запрос или команда `publish_snapshots`.
+    """
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY.format(name))
+    if snapshot is None:
+        snapshot = publish_snapshot(name)
+    return snapshot
+
+
+def invalidate_snapshot(name):
+    cache.delete(SNAPSHOT_CACHE_KEY.format(name))
+
+
+def choose_encoding(accept_encoding, encodings):
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+
+    for encoding in ('br', 'gzip'):
+        if encoding in encodings and encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def snapshot_response(request, name):
+    snapshot = get_snapshot(name)
+    encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), snapshot['encodings'])
+    etag = f'"{snapshot["version"]}"' if encoding == 'identity' else f'"{snapshot["version"]}-{encoding}"'
+
+    response = HttpResponse(snapshot['encodings'][encoding], content_type='application/json')
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(snapshot['last_modified'])
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=snapshot['last_modified'],
+        response=response,
+    )
@@ -0,0 +1,634 @@
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import TestCase, override_settings
+
+from .assignment import assign_restaurants, choose_restaurants
+from .availability import (
+    AVAILABILITY_MATRIX_KEY,
+    AvailabilityMatrix,
+    get_availability_matrix,
+    get_available_products_ids,
+    get_menu_generation,
+)
+from .management.commands.benchmark_site import find_regressions
+from .models import (
+    Order,
+    OrderItem,
+    OrderProcessingTask,
+    OrderStatistics,
+    Product,
+    Restaurant,
+    RestaurantMenuItem,
+)
+from .restaurants_grid import get_restaurants_grid
+from .snapshots import SNAPSHOT_CACHE_KEY, build_snapshot, get_products_data
+from geocoder.locations_coordinates import coordinates_cache
+from geocoder.models import Location
+from geocoder.stub import StubGeocoderServer
+from star_burger.db_backends.health_checks import LazyHealthCheckMixin
+from star_burger import instrumentation
+from star_burger.instrumentation import MetricsRegistry, registry
+
+
+class RegisterOrderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Star Burger', lat=55.75, lon=37.62)
+        self.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100 + number, image='burger.jpg')
+            for number in range(20)
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            [RestaurantMenuItem(restaurant=restaurant, product=product) for product in self.products]
+        )
+        self.unavailable_product = Product.objects.create(name='Сезонный бургер', price=300, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.unavailable_product, availability=False)
+
+    def get_order_payload(self, products):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79291234567',
+            'address': 'Москва, Тверская 1',
+            'products': [{'product': product.id, 'quantity': 2} for product in products],
+        }
+
+    def test_registers_order_in_constant_number_of_queries(self):
+        # выборка товаров, вставка заказа, его элементов и задачи на обработку,
+        # плюс SAVEPOINT и RELEASE от transaction.atomic внутри транзакции теста
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                '/api/order/',
+                self.get_order_payload(self.products),
+                content_type='application/json',
+            )
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual(
+            sorted(OrderItem.objects.filter(order=order).values_list('product_id', 'price')),
+            [(product.id, product.price) for product in self.products],
+        )
+        self.assertEqual(order.total_cost, sum(product.price * 2 for product in self.products))
+        self.assertEqual(order.items_count, 40)
+
+    def test_rejects_unavailable_products(self):
+        response = self.client.post(
+            '/api/order/',
+            self.get_order_payload([self.products[0], self.unavailable_product]),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'products': [f'Товара {self.unavailable_product.id} сейчас нет в продаже.']})
+        self.assertFalse(Order.objects.exists())
+
+    def test_rejects_unknown_products(self):
+        unknown_product_id = self.unavailable_product.id + 1000
+        payload = self.get_order_payload([self.products[0]])
+        payload['products'].append({'product': unknown_product_id, 'quantity': 1})
+
+        response = self.client.post('/api/order/', payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'products': [f"Недопустимый первичный ключ '{unknown_product_id}'."]})
+
+    def test_updates_cached_availability_after_menu_change(self):
+        self.assertIn(self.products[0].id, get_available_products_ids())
+
+        RestaurantMenuItem.objects.filter(product=self.products[0]).get().delete()
+
+        self.assertNotIn(self.products[0].id, get_available_products_ids())
+        self.assertNotIn(self.products[0], Product.objects.available())
+
+    def test_rejects_product_taken_off_sale_in_another_process(self):
+        get_available_products_ids()
+        # update() не вызывает сигналов, как и изменение меню в другом процессе с кэшем в его памяти
+        RestaurantMenuItem.objects.filter(product=self.products[0]).update(availability=False)
+
+        response = self.client.post(
+            '/api/order/',
+            self.get_order_payload([self.products[0]]),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class ProcessOrdersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        coordinates_cache.clear()
+        Location.objects.bulk_create([
+            Location(address='Москва, Тверская 1', lat=55.757, lon=37.613),
+            Location(address='Москва, Арбат 2', lat=55.752, lon=37.600),
+            Location(address='Москва, Ленинский 10', lat=55.720, lon=37.590),
+            Location(address='Москва, Лубянка 3', lat=55.759, lon=37.626),
+        ])
+        self.burger = Product.objects.create(name='Бургер', price=150, image='burger.jpg')
+        self.fries = Product.objects.create(name='Картошка', price=80, image='fries.jpg')
+        self.near_restaurant = Restaurant.objects.create(name='Тверская', address='Москва, Тверская 1')
+        self.far_restaurant = Restaurant.objects.create(name='Ленинский', address='Москва, Ленинский 10')
+        self.small_restaurant = Restaurant.objects.create(name='Арбат', address='Москва, Арбат 2')
+        RestaurantMenuItem.objects.bulk_create([
+            RestaurantMenuItem(restaurant=self.near_restaurant, product=self.burger),
+            RestaurantMenuItem(restaurant=self.near_restaurant, product=self.fries),
+            RestaurantMenuItem(restaurant=self.far_restaurant, product=self.burger),
+            RestaurantMenuItem(restaurant=self.far_restaurant, product=self.fries),
+            RestaurantMenuItem(restaurant=self.small_restaurant, product=self.burger),
+        ])
+        self.order = Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79291234567', address='Москва, Лубянка 3',
+        )
+        OrderItem.objects.create(order=self.order, product=self.burger, quantity=1, price=150)
+        OrderItem.objects.create(order=self.order, product=self.fries, quantity=1, price=80)
+        OrderProcessingTask.objects.create(order=self.order)
+
+    def get_candidates(self):
+        return list(
+            self.order.candidate_restaurants.order_by('distance').values_list('restaurant__name', flat=True)
+        )
+
+    def test_selects_restaurants_with_whole_order_by_distance(self):
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+
+        self.assertFalse(OrderProcessingTask.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(self.get_candidates(), ['Тверская', 'Ленинский'])
+
+    def test_retries_orders_when_geocoder_is_unavailable(self):
+        self.order.address = 'Москва, Петровка 5'
+        self.order.save()
+
+        with self.settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/1.x'):
+            call_command('process_orders', '--once', '--workers=0', stdout=StringIO(), stderr=StringIO())
+        task = OrderProcessingTask.objects.get()
+        self.order.refresh_from_db()
+        self.assertIsNone(task.processed_at)
+        self.assertIn('GeocodingFailed', task.error)
+        self.assertIsNone(self.order.candidates_updated_at)
+
+        OrderProcessingTask.objects.update(started_at=None)
+        coordinates_cache.clear()
+        Location.objects.create(address='Москва, Петровка 5', lat=55.765, lon=37.617)
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.lat, self.order.lon), (55.765, 37.617))
+        self.assertEqual(self.get_candidates(), ['Тверская', 'Ленинский'])
+
+    def test_moves_refreshed_coordinates_to_restaurants_and_orders(self):
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+        Location.objects.filter(address__in=['Москва, Ленинский 10', 'Москва, Лубянка 3']).update(
+            verified_at=datetime.date(2000, 1, 1),
+        )
+
+        with StubGeocoderServer() as geocoder, self.settings(YANDEX_GEOCODER_URL=geocoder.url):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('refresh_locations', stdout=StringIO())
+
+        self.far_restaurant.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(
+            (self.far_restaurant.lat, self.far_restaurant.lon),
+            geocoder.get_coordinates('Москва, Ленинский 10'),
+        )
+        self.assertEqual((self.order.lat, self.order.lon), geocoder.get_coordinates('Москва, Лубянка 3'))
+        self.assertEqual(
+            get_restaurants_grid().points[self.far_restaurant.id],
+            geocoder.get_coordinates('Москва, Ленинский 10'),
+        )
+
+    def test_recomputes_candidates_when_menu_changes(self):
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item = RestaurantMenuItem.objects.get(restaurant=self.near_restaurant, product=self.fries)
+            menu_item.availability = False
+            menu_item.save()
+
+        self.assertEqual(self.get_candidates(), ['Ленинский'])
+
+    def test_recomputes_candidates_with_matrix_built_after_commit(self):
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+        stale_matrix = get_availability_matrix()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item = RestaurantMenuItem.objects.get(restaurant=self.near_restaurant, product=self.fries)
+            menu_item.availability = False
+            menu_item.save()
+            # другой процесс успел собрать матрицу по данным до фиксации
+            cache.set(AVAILABILITY_MATRIX_KEY.format(get_menu_generation()), stale_matrix)
+
+        self.assertEqual(self.get_candidates(), ['Ленинский'])
+        self.assertEqual(
+            get_availability_matrix().get_restaurants_ids([self.burger.id, self.fries.id]),
+            [self.far_restaurant.id],
+        )
+
+    def test_skips_menu_items_of_restaurants_created_while_matrix_is_built(self):
+        matrix = AvailabilityMatrix(
+            [(self.near_restaurant.id, 'Тверская')],
+            [(self.burger.id, self.near_restaurant.id), (self.burger.id, self.near_restaurant.id + 1000)],
+        )
+
+        self.assertEqual(matrix.get_restaurants_ids([self.burger.id]), [self.near_restaurant.id])
+
+    def test_bulk_toggles_availability_through_api(self):
+        call_command('process_orders', '--once', '--workers=0', stdout=StringIO())
+        self.client.force_login(User.objects.create_user('manager', is_staff=True))
+        payload = {
+            'availability': False,
+            'menu_items': [
+                {'restaurant': self.near_restaurant.id, 'product': self.fries.id},
+                {'restaurant': self.far_restaurant.id, 'product': self.fries.id},
+            ],
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/menu/availability/', payload, content_type='application/json')
+
+        self.assertEqual(response.json(), {'updated': 2})
+        self.assertFalse(RestaurantMenuItem.objects.filter(product=self.fries, availability=True).exists())
+        self.assertEqual(self.get_candidates(), [])
+        self.assertNotIn(self.fries.id, [product['id'] for product in self.client.get('/api/products/').json()])
+
+    def test_rejects_bulk_toggle_for_missing_menu_items(self):
+        self.client.force_login(User.objects.create_user('manager', is_staff=True))
+        payload = {
+            'availability': False,
+            'menu_items': [{'restaurant': self.small_restaurant.id, 'product': self.fries.id}],
+        }
+
+        response = self.client.post('/api/menu/availability/', payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class GeocodePendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        coordinates_cache.clear()
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        self.checkpoint = os.path.join(checkpoint_dir.name, 'checkpoint.json')
+
+    def create_orders(self, addresses):
+        for address in addresses:
+            Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79291234567', address=address)
+
+    def test_resumes_from_last_scanned_order(self):
+        Location.objects.create(address='Москва, ул. Тверская, 1', lat=55.757, lon=37.613)
+        self.create_orders(['Москва, Арбат 2', 'тверская ул 1 москва', 'Москва, Арбат 2'])
+
+        with StubGeocoderServer() as geocoder, self.settings(YANDEX_GEOCODER_URL=geocoder.url):
+            call_command('geocode_pending', '--batch-size=2', f'--checkpoint={self.checkpoint}', stdout=StringIO())
+            self.create_orders(['Москва, Лубянка 3'])
+            call_command('geocode_pending', f'--checkpoint={self.checkpoint}', stdout=StringIO())
+
+        self.assertEqual(geocoder.requested_addresses, ['Москва, Арбат 2', 'Москва, Лубянка 3'])
+        with open(self.checkpoint) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)['last_order_id'], Order.objects.latest('id').id)
+
+    def test_retries_failed_orders_and_updates_their_coordinates(self):
+        self.create_orders(['Москва, Арбат 2'])
+        order = Order.objects.get()
+        order.candidates_updated_at = order.created
+        order.save()
+
+        with self.settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/1.x'):
+            call_command('geocode_pending', f'--checkpoint={self.checkpoint}', stdout=StringIO(), stderr=StringIO())
+        with open(self.checkpoint) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)['failed_orders_ids'], [order.id])
+
+        coordinates_cache.clear()
+        with StubGeocoderServer() as geocoder, self.settings(YANDEX_GEOCODER_URL=geocoder.url):
+            call_command('geocode_pending', f'--checkpoint={self.checkpoint}', stdout=StringIO())
+
+        order.refresh_from_db()
+        self.assertEqual((order.lat, order.lon), geocoder.get_coordinates('Москва, Арбат 2'))
+        with open(self.checkpoint) as checkpoint_file:
+            self.assertEqual(json.load(checkpoint_file)['failed_orders_ids'], [])
+
+    def test_fills_coordinates_of_restaurants_saved_while_geocoder_was_down(self):
+        with self.settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/1.x'):
+            restaurant = Restaurant.objects.create(name='Арбат', address='Москва, Арбат 2')
+        self.assertIsNone(restaurant.lat)
+
+        coordinates_cache.clear()
+        with StubGeocoderServer() as geocoder, self.settings(YANDEX_GEOCODER_URL=geocoder.url):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('geocode_pending', f'--checkpoint={self.checkpoint}', stdout=StringIO())
+
+        restaurant.refresh_from_db()
+        self.assertEqual((restaurant.lat, restaurant.lon), geocoder.get_coordinates('Москва, Арбат 2'))
+        self.assertIn(restaurant.id, get_restaurants_grid().points)
+
+    def test_geocodes_restaurant_again_on_next_save(self):
+        with self.settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/1.x'), self.assertLogs('foodcartapp.signals'):
+            restaurant = Restaurant.objects.create(name='Арбат', address='Москва, Арбат 2')
+        self.assertFalse(Location.objects.exists())
+
+        coordinates_cache.clear()
+        with StubGeocoderServer() as geocoder, self.settings(YANDEX_GEOCODER_URL=geocoder.url):
+            restaurant.name = 'Арбат 2'
+            restaurant.save()
+
+        self.assertEqual((restaurant.lat, restaurant.lon), geocoder.get_coordinates('Москва, Арбат 2'))
+
+
+class AssignRestaurantsTest(TestCase):
+    def test_balances_distance_and_load(self):
+        assignments = choose_restaurants(
+            [
+                ('первый', [('рядом', 1.0), ('дальше', 1.5)]),
+                ('второй', [('рядом', 1.0), ('дальше', 1.5)]),
+                ('третий', [('дальше', 0.5)]),
+            ],
+            {'рядом': 0},
+            load_penalty_km=1,
+        )
+
+        self.assertEqual(assignments, {'первый': 'рядом', 'второй': 'дальше', 'третий': 'дальше'})
+
+    def test_skips_fully_loaded_restaurants(self):
+        assignments = choose_restaurants(
+            [('первый', [('рядом', 1.0)]), ('второй', [('рядом', 1.0)])],
+            {'рядом': 1},
+            load_penalty_km=0,
+            max_load=2,
+        )
+
+        self.assertEqual(assignments, {'первый': 'рядом'})
+
+    def test_assigns_unwatched_orders(self):
+        Location.objects.bulk_create([
+            Location(address='Тверская 1', lat=55.757, lon=37.613),
+            Location(address='Арбат 2', lat=55.752, lon=37.600),
+        ])
+        near_restaurant = Restaurant.objects.create(name='Тверская', address='Тверская 1')
+        far_restaurant = Restaurant.objects.create(name='Арбат', address='Арбат 2')
+        orders = [
+            Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79291234567', address='Москва')
+            for _ in range(2)
+        ]
+        cooking_order = Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79291234567', address='Москва',
+            status=Order.COOKING, cooking_restaurant=near_restaurant,
+        )
+        for order in orders + [cooking_order]:
+            order.candidate_restaurants.create(restaurant=near_restaurant, distance=1)
+            order.candidate_restaurants.create(restaurant=far_restaurant, distance=1.5)
+
+        with self.settings(ASSIGNMENT_LOAD_PENALTY_KM=1, ASSIGNMENT_MAX_RESTAURANT_LOAD=0):
+            assign_restaurants()
+
+        self.assertEqual(
+            list(Order.objects.filter(id__in=[order.id for order in orders]).order_by('id')
+                 .values_list('cooking_restaurant__name', flat=True)),
+            ['Арбат', 'Тверская'],
+        )
+
+
+class OrderTotalsTest(TestCase):
+    def test_recalculates_totals_from_items(self):
+        product = Product.objects.create(name='Бургер', price=150, image='burger.jpg')
+        order = Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79291234567', address='Москва')
+        empty_order = Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79291234567', address='Москва', total_cost=10,
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=3, price=150)
+        OrderItem.objects.create(order=order, product=product, quantity=1, price=100)
+
+        Order.objects.recalculate_totals()
+
+        order.refresh_from_db()
+        empty_order.refresh_from_db()
+        self.assertEqual((order.total_cost, order.items_count), (550, 4))
+        self.assertEqual((empty_order.total_cost, empty_order.items_count), (0, 0))
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_collects_sampled_view_metrics(self):
+        with self.settings(METRICS_SAMPLE_RATE=1, METRICS_TOKEN='secret'):
+            self.client.get('/api/products/')
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+
+        metrics = response.content.decode()
+        self.assertIn('starburger_view_queries_count{view="foodcartapp.views.product_list_api"} 1', metrics)
+        self.assertIn('starburger_view_response_bytes_bucket{view="foodcartapp.views.product_list_api"', metrics)
+
+    def test_skips_requests_outside_sample(self):
+        with self.settings(METRICS_SAMPLE_RATE=0):
+            self.client.get('/api/products/')
+
+        self.assertNotIn('product_list_api', registry.render())
+
+    def test_requires_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').status_code, 404)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer wrong')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_sums_metrics_of_all_processes(self):
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        other_process_registry = MetricsRegistry()
+        other_process_registry.observe('foodcartapp.views.product_list_api', {'starburger_view_queries': 2})
+        with open(os.path.join(metrics_dir.name, 'metrics-1-other.json'), 'w') as metrics_file:
+            json.dump(other_process_registry.dump(), metrics_file)
+
+        with self.settings(METRICS_SAMPLE_RATE=1, METRICS_TOKEN='secret', METRICS_DIR=metrics_dir.name):
+            self.client.get('/api/products/')
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+
+        metrics = response.content.decode()
+        self.assertIn('starburger_view_queries_count{view="foodcartapp.views.product_list_api"} 2', metrics)
+        self.assertIn('starburger_view_duration_seconds_count{view="foodcartapp.views.product_list_api"} 1', metrics)
+
+    def test_saves_metrics_outside_request_thread(self):
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        saving_threads = []
+
+        with patch.object(instrumentation, 'save_process_metrics', lambda: saving_threads.append(threading.get_ident())):
+            with self.settings(METRICS_SAMPLE_RATE=1, METRICS_DIR=metrics_dir.name):
+                self.client.get('/api/products/')
+
+        self.assertNotIn(threading.get_ident(), saving_threads)
+        self.assertEqual(instrumentation.metrics_flusher_pid, os.getpid())
+
+
+class LazyHealthCheckTest(TestCase):
+    class DatabaseWrapper(LazyHealthCheckMixin, SQLiteDatabaseWrapper):
+        usable = True
+        checks_count = 0
+
+        def is_usable(self):
+            self.checks_count += 1
+            return self.usable
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database = self.DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'CONN_HEALTH_CHECKS': True,
+        })
+        self.addCleanup(self.database.close)
+
+    @override_settings(DB_CONN_HEALTH_CHECK_IDLE=10)
+    def test_checks_connection_only_after_idle(self):
+        self.database.cursor().close()
+        self.database.cursor().close()
+        self.assertEqual(self.database.checks_count, 0)
+
+        self.database.last_used_at -= 11
+        self.database.cursor().close()
+        self.database.cursor().close()
+        self.assertEqual(self.database.checks_count, 1)
+
+    @override_settings(DB_CONN_HEALTH_CHECK_IDLE=10)
+    def test_reconnects_after_broken_connection(self):
+        self.database.cursor().close()
+        broken_connection = self.database.connection
+        self.database.usable = False
+        self.database.last_used_at -= 11
+        self.database.cursor().close()
+        self.assertIsNot(self.database.connection, broken_connection)
+
+
+class BenchmarkRegressionsTest(TestCase):
+    def test_compares_queries_exactly_and_latency_with_tolerance(self):
+        baseline = {'GET /api/products/': {'max_queries': 1, 'p95_ms': 10}}
+
+        self.assertEqual(
+            find_regressions({'GET /api/products/': {'max_queries': 1, 'p95_ms': 14}}, baseline, 0.5),
+            [],
+        )
+        self.assertEqual(
+            len(find_regressions({'GET /api/products/': {'max_queries': 2, 'p95_ms': 16}}, baseline, 0.5)),
+            2,
+        )
+
+
+class ProductsSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Star Burger', lat=55.75, lon=37.62)
+        self.product = Product.objects.create(name='Бургер', price=150, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.product)
+
+    def test_chooses_accepted_encoding(self):
+        identity = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        compressed = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='deflate, gzip')
+
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), identity.content)
+        self.assertEqual(compressed['ETag'], identity['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+
+    def test_answers_not_modified_until_products_change(self):
+        etag = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 170
+            self.product.save()
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_drops_snapshot_published_before_commit(self):
+        stale_snapshot = build_snapshot(get_products_data())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 170
+            self.product.save()
+            # запрос из другого процесса, пришедший до фиксации, публикует снимок по старым данным
+            cache.set(SNAPSHOT_CACHE_KEY.format('products'), stale_snapshot)
+
+        self.assertEqual(json.loads(self.client.get('/api/products/').content)[0]['price'], '170.00')
+
+
+class OrdersStatisticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(name='Star Burger', lat=55.75, lon=37.62)
+        self.product = Product.objects.create(name='Бургер', price=150, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.product)
+
+    def get_statistics(self):
+        return set(OrderStatistics.objects.values_list('restaurant_id', 'status', 'orders_count', 'revenue'))
+
+    def test_follows_orders_changes_and_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/order/',
+                {
+                    'firstname': 'Иван',
+                    'lastname': 'Петров',
+                    'phonenumber': '+79291234567',
+                    'address': 'Москва, Тверская 1',
+                    'products': [{'product': self.product.id, 'quantity': 2}],
+                },
+                content_type='application/json',
+            )
+        self.assertEqual(self.get_statistics(), {(None, Order.UNWATCHED, 1, 300)})
+
+        order = Order.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.cooking_restaurant = self.restaurant
+            order.status = Order.COOKING
+            order.save()
+            Order.objects.create(firstname='Анна', lastname='Смирнова', phonenumber='+79291234568', total_cost=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(firstname='Олег', lastname='Иванов', phonenumber='+79291234569').delete()
+        statistics = {(None, Order.UNWATCHED, 1, 100), (self.restaurant.id, Order.COOKING, 1, 300)}
+        self.assertEqual(self.get_statistics(), statistics)
+
+        OrderStatistics.objects.update(orders_count=0)
+        call_command('rebuild_orders_statistics', '--chunk-hours=1', stdout=StringIO())
+        self.assertEqual(self.get_statistics(), statistics)
+
+
+class RestaurantProductsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(name='Star Burger', lat=55.75, lon=37.62)
+        self.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100 + number, image='burger.jpg')
+            for number in range(3)
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            [RestaurantMenuItem(restaurant=self.restaurant, product=product) for product in self.products]
+        )
+        unavailable_product = Product.objects.create(name='Сезонный бургер', price=300, image='burger.jpg')
+        RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=unavailable_product, availability=False)
+
+    def test_lists_restaurant_products(self):
+        response = self.client.get(f'/api/restaurants/{self.restaurant.id}/products/')
+
+        self.assertEqual(response.json()['products'], [product.id for product in self.products])
+        self.assertEqual(self.client.get(f'/api/restaurants/{self.restaurant.id + 1}/products/').status_code, 404)
@@ -1,6 +1,7 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import banners_list_api, product_list_api, register_order, restaurant_products_api
+from .views import update_menu_availability
 
 
 app_name = "foodcartapp"
@@ -9,4 +10,6 @@ urlpatterns = [
     path('products/', product_list_api),
     path('banners/', banners_list_api),
     path('order/', register_order),
+    path('menu/availability/', update_menu_availability),
+    path('restaurants/<int:restaurant_id>/products/', restaurant_products_api),
 ]
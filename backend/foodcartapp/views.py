@@ -2,84 +2,43 @@ import json
 
 import phonenumbers
 from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from geopy import distance
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.serializers import BooleanField
+from rest_framework.serializers import IntegerField
 from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import Serializer
 from rest_framework.serializers import ValidationError
 
+from .availability import get_availability_matrix, set_menu_items_availability
 from .models import Order
 from .models import OrderItem
+from .models import OrderProcessingTask
 from .models import Product
-from geocoder.locations_coordinates import get_or_create_coordinates
+from .models import RestaurantMenuItem
+from .snapshots import snapshot_response
+
+
+MENU_AVAILABILITY_MAX_ITEMS = 1000
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return snapshot_response(request, 'banners')
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return snapshot_response(request, 'products')
 
 
 class OrderItemSerializer(ModelSerializer):
+    product = IntegerField(min_value=1)
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
 
-        def validate_product(self, value):
-            try:
-                value = Product.objects.get(pk=value)
-            except Product.DoesNotExist:
-                raise ValidationError('Недопустимый первичный ключ ' "'" f'{value}' "'.")
-            return value
-
 
 class OrderSerializer(ModelSerializer):
     products = OrderItemSerializer(many=True, allow_empty=False, write_only=True)
@@ -94,44 +53,112 @@ class OrderSerializer(ModelSerializer):
             raise ValidationError("Введён некорректный номер телефона.")
         return value
 
+    def validate_products(self, value):
+        products_ids = {order_item_fields['product'] for order_item_fields in value}
+        # наличие проверяется по БД, а не по кэшу: заказ не должен пройти с только что снятым товаром
+        products = Product.objects.available(from_db=True).in_bulk(products_ids)
+
+        missing_products_ids = sorted(products_ids - products.keys())
+        if missing_products_ids:
+            existing_products_ids = set(
+                Product.objects.filter(pk__in=missing_products_ids).values_list('pk', flat=True)
+            )
+            for product_id in missing_products_ids:
+                if product_id in existing_products_ids:
+                    raise ValidationError(f'Товара {product_id} сейчас нет в продаже.')
+            raise ValidationError(
+                'Недопустимый первичный ключ ' "'" f'{missing_products_ids[0]}' "'."
+            )
+
+        for order_item_fields in value:
+            order_item_fields['product'] = products[order_item_fields['product']]
+        return value
+
 
-@transaction.atomic
 @api_view(['POST'])
 def register_order(request):
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    order = Order.objects.create(
-        firstname=serializer.validated_data["firstname"],
-        lastname=serializer.validated_data["lastname"],
-        phonenumber=serializer.validated_data["phonenumber"],
-        address=serializer.validated_data["address"]
-    )
-
     order_items_fields = serializer.validated_data["products"]
     for order_item_fields in order_items_fields:
         order_item_fields['price'] = order_item_fields['product'].price
 
-    products = [OrderItem(order=order, **order_item_fields) for order_item_fields in order_items_fields]
-    OrderItem.objects.bulk_create(products)
+    with transaction.atomic():
+        order = Order.objects.create(
+            firstname=serializer.validated_data["firstname"],
+            lastname=serializer.validated_data["lastname"],
+            phonenumber=serializer.validated_data["phonenumber"],
+            address=serializer.validated_data["address"],
+            total_cost=sum(fields['price'] * fields['quantity'] for fields in order_items_fields),
+            items_count=sum(fields['quantity'] for fields in order_items_fields),
+        )
+        products = [OrderItem(order=order, **order_item_fields) for order_item_fields in order_items_fields]
+        OrderItem.objects.bulk_create(products)
+        OrderProcessingTask.objects.create(order=order)
 
     return Response(OrderSerializer(instance=order).data)
 
 
-def get_restaurants_definitions(address, restaurants, locations):
-    lat, lon = get_or_create_coordinates(address, locations)
-    if not lat or not lon:
-        return ['- (адрес клиента не распознан)']
+class MenuItemSerializer(Serializer):
+    restaurant = IntegerField(min_value=1)
+    product = IntegerField(min_value=1)
+
+
+class MenuAvailabilitySerializer(Serializer):
+    availability = BooleanField()
+    menu_items = MenuItemSerializer(many=True, allow_empty=False, max_length=MENU_AVAILABILITY_MAX_ITEMS)
 
-    address_coordinates = [lat, lon]
-    restaurants_with_distances = []
-    for restaurant in restaurants:
-        restaurant_coordinates = get_or_create_coordinates(restaurant.address, locations)
-        restaurant_distance = round(distance.distance(restaurant_coordinates, address_coordinates).km, 2)
-        restaurants_with_distances.append((restaurant.name, restaurant_distance))
+    def validate_menu_items(self, value):
+        pairs = {(menu_item_fields['restaurant'], menu_item_fields['product']) for menu_item_fields in value}
+        menu_items = RestaurantMenuItem.objects.filter(
+            restaurant_id__in={restaurant_id for restaurant_id, _ in pairs},
+            product_id__in={product_id for _, product_id in pairs},
+        )
+        menu_items = [
+            menu_item for menu_item in menu_items
+            if (menu_item.restaurant_id, menu_item.product_id) in pairs
+        ]
+
+        missing_pairs = sorted(pairs - {(menu_item.restaurant_id, menu_item.product_id) for menu_item in menu_items})
+        if missing_pairs:
+            restaurant_id, product_id = missing_pairs[0]
+            raise ValidationError(f'Товара {product_id} нет в меню ресторана {restaurant_id}.')
+        return menu_items
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def update_menu_availability(request):
+    serializer = MenuAvailabilitySerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    updated_count = set_menu_items_availability(
+        serializer.validated_data['menu_items'],
+        serializer.validated_data['availability'],
+    )
+    return Response({'updated': updated_count})
+
+
+@api_view(['GET'])
+def restaurant_products_api(request, restaurant_id):
+    availability_matrix = get_availability_matrix()
+    if restaurant_id not in dict(availability_matrix.restaurants):
+        raise NotFound()
+    return Response({
+        'restaurant': restaurant_id,
+        'products': sorted(availability_matrix.get_restaurant_products_ids(restaurant_id)),
+    })
+
+
+def get_restaurants_definitions(order, candidate_restaurants):
+    if not order.candidates_updated_at:
+        return ['- (заказ ещё не обработан)']
+    if order.lat is None or order.lon is None:
+        return ['- (адрес клиента не распознан)']
 
-    restaurants_with_distances.sort(key=lambda x: x[1])
     return [
-        f'{restaurant_name} - {restaurant_distance} км'
-        for restaurant_name, restaurant_distance in restaurants_with_distances
+        f'{candidate.restaurant.name} - {round(candidate.distance, 2)} км'
+        for candidate in candidate_restaurants
+        if candidate.distance is not None
     ]
@@ -0,0 +1,46 @@
+import re
+
+
+ABBREVIATIONS = {
+    'улица': 'ул',
+    'проспект': 'пр-кт',
+    'просп': 'пр-кт',
+    'пр-т': 'пр-кт',
+    'проезд': 'пр-д',
+    'переулок': 'пер',
+    'площадь': 'пл',
+    'шоссе': 'ш',
+    'бульвар': 'б-р',
+    'бул': 'б-р',
+    'набережная': 'наб',
+    'корпус': 'к',
+    'корп': 'к',
+    'строение': 'стр',
+    'область': 'обл',
+    'микрорайон': 'мкр',
+}
+DROPPED_WORDS = {'г', 'город', 'д', 'дом'}
+NUMBERED_WORDS = {'к', 'стр'}
+
+
+def normalize_address(address):
+    """Ключ адреса, одинаковый для разных записей одного и того же адреса.
+
+    Регистр, «ё», знаки препинания, сокращения и порядок слов не важны:
+    «Москва, ул. Ленина, д. 1» и «ул Ленина 1, г Москва» дают один ключ.
+    Номера дома, корпуса и строения сохраняют свой порядок, чтобы
+    «д. 10, корп. 2» и «д. 2, корп. 10» остались разными адресами.
+    """
+    words = re.findall(r'\w+(?:-\w+)*', address.lower().replace('ё', 'е'))
+    words = [ABBREVIATIONS.get(word, word) for word in words if word not in DROPPED_WORDS]
+
+    names = []
+    numbers = []
+    for previous_word, word in zip([None] + words, words):
+        if previous_word in NUMBERED_WORDS and word[0].isdigit():
+            word = names.pop() + word
+        if any(char.isdigit() for char in word):
+            numbers.append(word)
+        else:
+            names.append(word)
+    return ' '.join(sorted(names) + numbers)
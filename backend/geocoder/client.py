@@ -0,0 +1,135 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from star_burger.instrumentation import count_geocoder_calls
+
+from .addresses import normalize_address
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_CACHE_KEY = 'geocoder:requests:{}'
+
+in_flight_lookups = {}
+in_flight_lookups_lock = threading.Lock()
+
+
+def fetch_locations_coordinates(addresses):
+    """Запросить координаты параллельно; адреса, для которых запрос не удался, пропускаются.
+
+    Одновременные запросы одного и того же адреса из разных потоков процесса
+    объединяются по нормализованному ключу: к геокодеру уходит один запрос,
+    остальные ждут его ответа.
+    """
+    addresses_keys = {address: normalize_address(address) for address in addresses}
+    own_lookups = {}
+    other_lookups = {}
+    with in_flight_lookups_lock:
+        for address, key in addresses_keys.items():
+            if key in own_lookups or key in other_lookups:
+                continue
+            if key in in_flight_lookups:
+                other_lookups[key] = in_flight_lookups[key]
+            else:
+                in_flight_lookups[key] = concurrent.futures.Future()
+                own_lookups[key] = address, in_flight_lookups[key]
+
+    keys_coordinates = {}
+    try:
+        if own_lookups:
+            count_geocoder_calls(len(own_lookups))
+            fetched_coordinates = async_to_sync(afetch_locations_coordinates)(
+                [address for address, _ in own_lookups.values()]
+            )
+            keys_coordinates = {
+                key: fetched_coordinates[address]
+                for key, (address, _) in own_lookups.items()
+                if address in fetched_coordinates
+            }
+    finally:
+        with in_flight_lookups_lock:
+            for key, (_, lookup) in own_lookups.items():
+                del in_flight_lookups[key]
+                lookup.set_result(keys_coordinates.get(key))
+
+    for key, lookup in other_lookups.items():
+        try:
+            address_coordinates = lookup.result(timeout=settings.GEOCODER_TIMEOUT * 2)
+        except concurrent.futures.TimeoutError:
+            continue
+        if address_coordinates is not None:
+            keys_coordinates[key] = address_coordinates
+    return {
+        address: keys_coordinates[key]
+        for address, key in addresses_keys.items()
+        if key in keys_coordinates
+    }
+
+
+async def afetch_locations_coordinates(addresses):
+    semaphore = asyncio.Semaphore(settings.GEOCODER_MAX_WORKERS)
+
+    async def try_fetch(client, address):
+        async with semaphore:
+            await wait_for_rate_limit()
+            return await try_fetch_coordinates_from_yandex_api(client, address)
+
+    async with httpx.AsyncClient(timeout=settings.GEOCODER_TIMEOUT) as client:
+        results = await asyncio.gather(*[try_fetch(client, address) for address in addresses])
+    return {
+        address: address_coordinates
+        for address, address_coordinates in zip(addresses, results)
+        if address_coordinates is not None
+    }
+
+
+async def wait_for_rate_limit():
+    """Не отправлять геокодеру больше `GEOCODER_RATE_LIMIT` запросов в секунду.
+
+    Запросы считаются в кэше Django, поэтому с общим кэшем ограничение
+    действует на все процессы сайта сразу.
+    """
+    if not settings.GEOCODER_RATE_LIMIT:
+        return
+    while True:
+        second = int(time.time())
+        key = RATE_LIMIT_CACHE_KEY.format(second)
+        cache.add(key, 0, timeout=2)
+        try:
+            if cache.incr(key) <= settings.GEOCODER_RATE_LIMIT:
+                return
+        except ValueError:
+            continue
+        await asyncio.sleep(second + 1 - time.time())
+
+
+async def try_fetch_coordinates_from_yandex_api(client, address):
+    try:
+        return await fetch_coordinates_from_yandex_api(client, address)
+    except (httpx.HTTPError, KeyError, ValueError):
+        logger.warning('Не удалось получить координаты адреса %r', address, exc_info=True)
+        return None
+
+
+async def fetch_coordinates_from_yandex_api(client, address):
+    response = await client.get(settings.YANDEX_GEOCODER_URL, params={
+        'geocode': address,
+        'apikey': settings.YANDEX_GEO_API_KEY,
+        'format': 'json',
+    })
+    response.raise_for_status()
+    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+
+    if not found_places:
+        return None, None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
+    return float(lat), float(lon)
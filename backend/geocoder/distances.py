@@ -0,0 +1,50 @@
+import numpy as np
+from geopy import distance
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_radians_array(coordinates):
+    points = np.array(
+        [(np.nan, np.nan) if lat is None or lon is None else (lat, lon) for lat, lon in coordinates],
+        dtype=float,
+    ).reshape(-1, 2)
+    return np.radians(points)
+
+
+def haversine_matrix(origins, destinations):
+    """Расстояния в км между всеми парами точек, одна строка на каждую точку из `origins`.
+
+    Для точек без координат (`None`) в матрице стоит `nan`.
+    """
+    origins = to_radians_array(origins)
+    destinations = to_radians_array(destinations)
+    origins_lat = origins[:, 0, np.newaxis]
+    origins_lon = origins[:, 1, np.newaxis]
+    destinations_lat = destinations[np.newaxis, :, 0]
+    destinations_lon = destinations[np.newaxis, :, 1]
+
+    haversine = (
+        np.sin((destinations_lat - origins_lat) / 2) ** 2
+        + np.cos(origins_lat) * np.cos(destinations_lat) * np.sin((destinations_lon - origins_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+
+def sort_by_distance(origin, destinations, distances, exact_top=0):
+    """Отсортировать точки по расстоянию от `origin`.
+
+    Возвращает пары `(индекс точки, расстояние в км)`, точки без расстояния
+    отбрасываются. Первые `exact_top` точек пересчитываются по геодезической
+    формуле, остальные остаются с расстоянием по гаверсинусу.
+    """
+    distances = np.asarray(distances, dtype=float)
+    known_indexes = np.flatnonzero(~np.isnan(distances))
+    known_indexes = known_indexes[np.argsort(distances[known_indexes], kind='stable')]
+    nearest = [(int(index), float(distances[index])) for index in known_indexes]
+
+    for position, (index, _) in enumerate(nearest[:exact_top]):
+        nearest[position] = index, distance.distance(origin, destinations[index]).km
+    nearest[:exact_top] = sorted(nearest[:exact_top], key=lambda item: item[1])
+    return nearest
@@ -1,33 +1,111 @@
-import requests
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
-from django.shortcuts import render
 
+from .addresses import normalize_address
+from .client import fetch_locations_coordinates
 from .models import Location
 
 
-def get_or_create_coordinates(address, locations):
-    for location in locations:
-        if location.address == address:
-            return location.lat, location.lon
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            value, expires_at = self.items[key]
+            if expires_at < time.monotonic():
+                del self.items[key]
+                return default
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.items[key] = value, time.monotonic() + timeout
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+coordinates_cache = LRUCache(settings.GEOCODER_CACHE_SIZE)
+LOOKUP_FAILED = 'failed'
+
+
+def get_or_create_coordinates(address):
+    return get_or_create_locations_coordinates([address])[address]
+
+
+def get_or_create_locations_coordinates(addresses):
+    """Вернуть координаты адресов; адреса, которые не удалось проверить, считаются нераспознанными."""
+    coordinates, _ = find_locations_coordinates(addresses)
+    return coordinates
+
 
-    lat, lon = fetch_coordinates_from_yandex_api(address)
-    Location.objects.create(address=address, lat=lat, lon=lon)
-    return lat, lon
+def find_locations_coordinates(addresses):
+    """Найти координаты адресов, по возможности не обращаясь к геокодеру.
 
+    Возвращает координаты и множество адресов, для которых геокодер не
+    ответил: их координаты — `(None, None)`, но это не ответ «адрес не найден».
+    Адреса сравниваются по ключу `normalize_address`, так что разные записи
+    одного адреса берут координаты из одной локации. Адреса, которые
+    геокодер не нашёл, хранятся в `Location` с пустыми координатами и
+    повторно не запрашиваются, пока не устареют. Устаревшие записи
+    отдаются как есть и обновляются командой `refresh_locations`.
+    Если геокодер недоступен, ошибка запоминается ненадолго, чтобы
+    следующие запросы не ждали таймаута снова.
+    """
+    addresses_keys = {address: normalize_address(address) for address in addresses}
+    keys_addresses = {}
+    keys_coordinates = {}
+    missing_keys = set()
+    failed_keys = set()
+    for address, key in addresses_keys.items():
+        if key in keys_addresses:
+            continue
+        keys_addresses[key] = address
+        if not key:
+            keys_coordinates[key] = None, None
+            continue
+        cached_coordinates = coordinates_cache.get(key)
+        if cached_coordinates == LOOKUP_FAILED:
+            failed_keys.add(key)
+        elif cached_coordinates:
+            keys_coordinates[key] = cached_coordinates
+        else:
+            missing_keys.add(key)
 
-def fetch_coordinates_from_yandex_api(address):
-    base_url = 'https://geocode-maps.yandex.ru/1.x'
-    response = requests.get(base_url, params={
-        'geocode': address,
-        'apikey': settings.YANDEX_GEO_API_KEY,
-        'format': 'json',
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+    if missing_keys:
+        locations = Location.objects.filter(key__in=missing_keys).values_list('key', 'lat', 'lon')
+        for key, lat, lon in locations:
+            keys_coordinates[key] = lat, lon
+            coordinates_cache.set(key, (lat, lon), settings.GEOCODER_CACHE_TIMEOUT)
+            missing_keys.discard(key)
 
-    if not found_places:
-        return None, None
+    if missing_keys:
+        fetched_coordinates = fetch_locations_coordinates(keys_addresses[key] for key in missing_keys)
+        Location.objects.upsert(fetched_coordinates)
+        for key in missing_keys:
+            address = keys_addresses[key]
+            if address in fetched_coordinates:
+                keys_coordinates[key] = fetched_coordinates[address]
+                coordinates_cache.set(key, keys_coordinates[key], settings.GEOCODER_CACHE_TIMEOUT)
+            else:
+                failed_keys.add(key)
+                coordinates_cache.set(key, LOOKUP_FAILED, settings.GEOCODER_FAILURE_CACHE_TIMEOUT)
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(' ')
-    return lat, lon
+    for key in failed_keys:
+        keys_coordinates[key] = None, None
+    coordinates = {address: keys_coordinates[key] for address, key in addresses_keys.items()}
+    failed_addresses = {address for address, key in addresses_keys.items() if key in failed_keys}
+    return coordinates, failed_addresses
@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from geopy import distance
+
+from geocoder.distances import haversine_matrix, sort_by_distance
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость расчёта расстояний от заказов до ресторанов: geopy в цикле и матрица NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--exact-top', type=int, default=settings.RESTAURANTS_EXACT_DISTANCE_TOP)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        orders = [generate_moscow_point(generator) for _ in range(options['orders'])]
+        restaurants = [generate_moscow_point(generator) for _ in range(options['restaurants'])]
+
+        started_at = time.perf_counter()
+        geopy_rankings = [
+            sorted(distance.distance(restaurant, order).km for restaurant in restaurants)
+            for order in orders
+        ]
+        geopy_duration = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        distances = haversine_matrix(orders, restaurants)
+        numpy_rankings = [
+            [km for _, km in sort_by_distance(order, restaurants, row, options['exact_top'])]
+            for order, row in zip(orders, distances)
+        ]
+        numpy_duration = time.perf_counter() - started_at
+
+        max_error = max(
+            abs(geopy_km - numpy_km)
+            for geopy_ranking, numpy_ranking in zip(geopy_rankings, numpy_rankings)
+            for geopy_km, numpy_km in zip(geopy_ranking, numpy_ranking)
+        )
+        self.stdout.write(f'Заказов: {len(orders)}, ресторанов: {len(restaurants)}')
+        self.stdout.write(f'geopy: {geopy_duration:.3f} с')
+        self.stdout.write(f'numpy: {numpy_duration:.3f} с (точно для первых {options["exact_top"]})')
+        self.stdout.write(f'Ускорение: {geopy_duration / numpy_duration:.1f}x, наибольшее расхождение: {max_error:.3f} км')
+
+
+def generate_moscow_point(generator):
+    return generator.uniform(55.55, 55.95), generator.uniform(37.35, 37.85)
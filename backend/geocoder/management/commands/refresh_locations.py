@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from geocoder.addresses import normalize_address
+from geocoder.client import fetch_locations_coordinates
+from geocoder.models import Location
+from geocoder.signals import locations_refreshed
+
+
+class Command(BaseCommand):
+    help = (
+        'Повторно запрашивает у геокодера координаты устаревших локаций '
+        'и сообщает об обновлённых адресах сигналом locations_refreshed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--limit', type=int, default=None, help='сколько локаций обновить за запуск')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = options['limit']
+        refreshed_count = failed_count = 0
+        last_id = 0
+        refreshed_keys = set()
+
+        while limit is None or refreshed_count + failed_count < limit:
+            if limit is not None:
+                batch_size = min(batch_size, limit - refreshed_count - failed_count)
+            locations = list(Location.objects.stale().filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not locations:
+                break
+            last_id = locations[-1].id
+
+            fetched_coordinates = fetch_locations_coordinates(location.address for location in locations)
+            Location.objects.upsert(fetched_coordinates)
+            refreshed_keys.update(normalize_address(address) for address in fetched_coordinates)
+            refreshed_count += len(fetched_coordinates)
+            failed_count += len(locations) - len(fetched_coordinates)
+
+        if refreshed_keys:
+            locations_refreshed.send(sender=Location, addresses_keys=refreshed_keys)
+        self.stdout.write(f'Обновлено локаций: {refreshed_count}, не удалось обновить: {failed_count}')
@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+import geocoder.models
+from geocoder.addresses import normalize_address
+
+
+def fill_locations_keys(apps, schema_editor):
+    """Заполнить ключи адресов и оставить по одной локации на ключ.
+
+    Из дублей остаётся локация с координатами, проверенная позже остальных.
+    """
+    Location = apps.get_model('geocoder', 'Location')
+
+    keys_locations = defaultdict(list)
+    for location in Location.objects.order_by('id').iterator():
+        location.key = normalize_address(location.address)
+        keys_locations[location.key].append(location)
+
+    kept_locations = []
+    duplicates_ids = []
+    for locations in keys_locations.values():
+        locations.sort(key=lambda location: (location.lat is not None, location.verified_at, location.id), reverse=True)
+        kept_locations.append(locations[0])
+        duplicates_ids.extend(location.id for location in locations[1:])
+
+    Location.objects.filter(id__in=duplicates_ids).delete()
+    Location.objects.bulk_update(kept_locations, ['key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='key',
+            field=geocoder.models.AddressKeyField(editable=False, max_length=255, null=True, verbose_name='ключ адреса'),
+        ),
+        migrations.RunPython(fill_locations_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='location',
+            name='key',
+            field=geocoder.models.AddressKeyField(editable=False, max_length=255, unique=True, verbose_name='ключ адреса'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from geocoder.addresses import normalize_address
+
+
+def recompute_locations_keys(apps, schema_editor):
+    """Пересчитать ключи адресов: номера домов и корпусов в них больше не сортируются.
+
+    Новые ключи различают больше адресов, чем прежние, но «к 2» и «к2»
+    теперь дают один ключ, поэтому из дублей остаётся локация с координатами,
+    проверенная позже остальных.
+    """
+    Location = apps.get_model('geocoder', 'Location')
+
+    keys_locations = defaultdict(list)
+    for location in Location.objects.order_by('id').iterator():
+        keys_locations[normalize_address(location.address)].append(location)
+
+    changed_locations = []
+    duplicates_ids = []
+    for key, locations in keys_locations.items():
+        locations.sort(key=lambda location: (location.lat is not None, location.verified_at, location.id), reverse=True)
+        duplicates_ids.extend(location.id for location in locations[1:])
+        if locations[0].key != key:
+            locations[0].key = key
+            changed_locations.append(locations[0])
+
+    Location.objects.filter(id__in=duplicates_ids).delete()
+    Location.objects.bulk_update(changed_locations, ['key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder', '0002_location_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_locations_keys, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,67 @@
+import datetime
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from .addresses import normalize_address
+
+
+class LocationQuerySet(models.QuerySet):
+    def stale(self):
+        today = timezone.localdate()
+        found_expired = today - datetime.timedelta(days=settings.LOCATION_TTL_DAYS)
+        not_found_expired = today - datetime.timedelta(days=settings.LOCATION_NOT_FOUND_TTL_DAYS)
+        return self.filter(
+            Q(lat__isnull=False, lon__isnull=False, verified_at__lt=found_expired)
+            | (Q(lat__isnull=True) | Q(lon__isnull=True)) & Q(verified_at__lt=not_found_expired)
+        )
+
+    def upsert(self, addresses_coordinates):
+        """Сохранить координаты адресов: новые адреса добавить, известные обновить.
+
+        Если адрес успел добавить параллельный запрос, его запись остаётся:
+        координаты в ней такие же свежие.
+        """
+        today = timezone.localdate()
+        keys_coordinates = {
+            normalize_address(address): (address, coordinates)
+            for address, coordinates in addresses_coordinates.items()
+        }
+        locations = self.filter(key__in=keys_coordinates.keys()).in_bulk(field_name='key')
+        for key, location in locations.items():
+            _, (location.lat, location.lon) = keys_coordinates[key]
+            location.verified_at = today
+        self.bulk_update(locations.values(), ['lat', 'lon', 'verified_at'])
+        self.bulk_create(
+            [
+                self.model(address=address, lat=lat, lon=lon)
+                for key, (address, (lat, lon)) in keys_coordinates.items()
+                if key not in locations
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class AddressKeyField(models.CharField):
+    """Ключ адреса из поля `address`; вычисляется при каждом сохранении, в том числе в `bulk_create`."""
+
+    def pre_save(self, model_instance, add):
+        key = normalize_address(model_instance.address)
+        setattr(model_instance, self.attname, key)
+        return key
 
 
 class Location(models.Model):
     verified_at = models.DateField('дата запроса к геокодеру', auto_now_add=True, db_index=True)
     address = models.CharField('адрес', max_length=255, db_index=True, unique=True)
+    key = AddressKeyField('ключ адреса', max_length=255, unique=True, editable=False)
     lat = models.FloatField('широта', null=True, blank=True)
     lon = models.FloatField('долгота', null=True, blank=True)
 
+    objects = LocationQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'локация'
         verbose_name_plural = 'локации'
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# отправляется после того, как `refresh_locations` заново запросил координаты локаций;
+# аргумент `addresses_keys` — ключи адресов обновлённых локаций
+locations_refreshed = Signal()
@@ -0,0 +1,92 @@
+import math
+from collections import defaultdict
+
+from .distances import haversine_matrix
+
+
+KM_PER_DEGREE = 111.195
+
+
+class GridIndex:
+    """Сетка из ячеек примерно `cell_km` x `cell_km` поверх точек с координатами.
+
+    Поиск ближайших точек обходит ячейки кольцами от ячейки запроса и
+    останавливается, как только дальние кольца уже не могут дать точку ближе
+    найденных, поэтому время поиска зависит от плотности точек рядом с
+    запросом, а не от общего числа точек.
+    """
+
+    def __init__(self, points, cell_km=2):
+        self.cell_km = cell_km
+        self.points = {}
+        self.cells = defaultdict(list)
+
+        points = [(key, lat, lon) for key, lat, lon in points if lat is not None and lon is not None]
+        reference_lat = sum(lat for _, lat, _ in points) / len(points) if points else 0
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lon_step = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(reference_lat)), 0.01))
+
+        for key, lat, lon in points:
+            self.points[key] = lat, lon
+            self.cells[self.get_cell(lat, lon)].append(key)
+
+        rows = [row for row, _ in self.cells]
+        columns = [column for _, column in self.cells]
+        self.bounds = (min(rows), max(rows), min(columns), max(columns)) if self.cells else None
+
+    def __len__(self):
+        return len(self.points)
+
+    def get_cell(self, lat, lon):
+        return math.floor(lat / self.lat_step), math.floor(lon / self.lon_step)
+
+    def get_ring_cells(self, center, ring):
+        row, column = center
+        if not ring:
+            yield center
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+    def get_max_ring(self, center):
+        if self.bounds is None:
+            return -1
+        row, column = center
+        min_row, max_row, min_column, max_column = self.bounds
+        return max(row - min_row, max_row - row, column - min_column, max_column - column)
+
+    def nearest(self, lat, lon, limit=None, radius_km=None, allowed_keys=None):
+        """Вернуть до `limit` пар `(ключ, расстояние в км)` в пределах `radius_km`, ближайшие первыми."""
+        center = self.get_cell(lat, lon)
+        max_ring = self.get_max_ring(center)
+        if radius_km is not None:
+            max_ring = min(max_ring, math.ceil(radius_km / self.cell_km) + 1)
+
+        found = []
+        for ring in range(max_ring + 1):
+            keys = [
+                key
+                for cell in self.get_ring_cells(center, ring)
+                for key in self.cells.get(cell, [])
+                if allowed_keys is None or key in allowed_keys
+            ]
+            if keys:
+                distances = haversine_matrix([(lat, lon)], [self.points[key] for key in keys])[0]
+                found.extend(
+                    (key, float(key_distance))
+                    for key, key_distance in zip(keys, distances)
+                    if radius_km is None or key_distance <= radius_km
+                )
+
+            if limit and len(found) >= limit:
+                found.sort(key=lambda item: item[1])
+                unvisited_min_distance = ring * self.cell_km * 0.9
+                if found[limit - 1][1] <= unvisited_min_distance:
+                    break
+
+        found.sort(key=lambda item: item[1])
+        return found[:limit] if limit else found
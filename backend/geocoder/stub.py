@@ -0,0 +1,74 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubGeocoderServer:
+    """Локальный сервер с ответами в формате геокодера Яндекса.
+
+    Нужен для тестов и бенчмарков без обращения к настоящему API: координаты
+    вычисляются из хеша адреса, адреса из `unknown_addresses` не находятся.
+    """
+
+    def __init__(self, unknown_addresses=(), delay=0):
+        self.unknown_addresses = set(unknown_addresses)
+        self.delay = delay
+        self.requested_addresses = []
+        self.requests_times = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.build_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/1.x'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_coordinates(self, address):
+        digest = hashlib.md5(address.encode()).digest()
+        lat = 55.5 + digest[0] / 1000
+        lon = 37.4 + digest[1] / 1000
+        return lat, lon
+
+    def build_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                address = parse_qs(urlparse(self.path).query).get('geocode', [''])[0]
+                with stub.lock:
+                    stub.requested_addresses.append(address)
+                    stub.requests_times.append(time.time())
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+
+                found_places = []
+                if address not in stub.unknown_addresses:
+                    lat, lon = stub.get_coordinates(address)
+                    found_places.append({'GeoObject': {'Point': {'pos': f'{lon} {lat}'}}})
+
+                body = json.dumps({
+                    'response': {'GeoObjectCollection': {'featureMember': found_places}},
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1,3 +1,216 @@
-from django.test import TestCase
-
-# Create your tests here.
+import datetime
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .addresses import normalize_address
+from .client import fetch_locations_coordinates
+from .locations_coordinates import coordinates_cache, find_locations_coordinates, get_or_create_locations_coordinates
+from .distances import haversine_matrix
+from .models import Location
+from .spatial_index import GridIndex
+from .stub import StubGeocoderServer
+
+
+class GetOrCreateLocationsCoordinatesTest(TestCase):
+    def setUp(self):
+        coordinates_cache.clear()
+        self.geocoder = StubGeocoderServer(unknown_addresses={'нигде'})
+        self.geocoder.__enter__()
+        self.addCleanup(self.geocoder.__exit__)
+        self.settings_override = override_settings(YANDEX_GEOCODER_URL=self.geocoder.url)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_fetches_only_missing_addresses(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=55.7, lon=37.6)
+
+        coordinates = get_or_create_locations_coordinates(
+            ['Москва, Тверская 1', 'Москва, Арбат 2', 'Москва, Арбат 2', 'нигде']
+        )
+
+        self.assertEqual(coordinates['Москва, Тверская 1'], (55.7, 37.6))
+        self.assertEqual(coordinates['Москва, Арбат 2'], self.geocoder.get_coordinates('Москва, Арбат 2'))
+        self.assertEqual(coordinates['нигде'], (None, None))
+        self.assertCountEqual(self.geocoder.requested_addresses, ['Москва, Арбат 2', 'нигде'])
+        self.assertEqual(Location.objects.count(), 3)
+
+    def test_finds_location_by_normalized_address(self):
+        Location.objects.create(address='Москва, ул. Ленина, д. 1', lat=55.7, lon=37.6)
+
+        coordinates = get_or_create_locations_coordinates(['ул Ленина 1, г Москва', 'москва улица ленина 1'])
+
+        self.assertEqual(coordinates, {'ул Ленина 1, г Москва': (55.7, 37.6), 'москва улица ленина 1': (55.7, 37.6)})
+        self.assertEqual(self.geocoder.requested_addresses, [])
+
+    def test_serves_repeated_lookups_from_cache(self):
+        get_or_create_locations_coordinates(['Москва, Арбат 2'])
+
+        with self.assertNumQueries(0):
+            coordinates = get_or_create_locations_coordinates(['Москва, Арбат 2'])
+
+        self.assertEqual(coordinates['Москва, Арбат 2'], self.geocoder.get_coordinates('Москва, Арбат 2'))
+        self.assertEqual(len(self.geocoder.requested_addresses), 1)
+
+    def test_remembers_addresses_not_found(self):
+        get_or_create_locations_coordinates(['нигде'])
+        coordinates_cache.clear()
+
+        coordinates = get_or_create_locations_coordinates(['нигде'])
+
+        self.assertEqual(coordinates['нигде'], (None, None))
+        self.assertEqual(self.geocoder.requested_addresses, ['нигде'])
+
+    def test_updates_existing_locations_on_upsert(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=None, lon=None)
+
+        Location.objects.upsert({'Москва, Тверская 1': (55.7, 37.6), 'Москва, Арбат 2': (55.75, 37.59)})
+
+        self.assertEqual(
+            {address: (lat, lon) for address, lat, lon in Location.objects.values_list('address', 'lat', 'lon')},
+            {'Москва, Тверская 1': (55.7, 37.6), 'Москва, Арбат 2': (55.75, 37.59)},
+        )
+
+    def test_does_not_save_failed_lookups(self):
+        with override_settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/1.x'):
+            coordinates = get_or_create_locations_coordinates(['Москва, Арбат 2'])
+            _, failed_addresses = find_locations_coordinates(['Москва, Арбат 2'])
+
+        self.assertEqual(coordinates['Москва, Арбат 2'], (None, None))
+        self.assertEqual(failed_addresses, {'Москва, Арбат 2'})
+        self.assertFalse(Location.objects.exists())
+
+
+class NormalizeAddressTest(SimpleTestCase):
+    def test_ignores_case_punctuation_abbreviations_and_word_order(self):
+        self.assertEqual(normalize_address('Москва, ул. Ленина 1'), normalize_address('ул Ленина, 1, Москва'))
+        self.assertEqual(
+            normalize_address('г. Москва, Ленинский проспект, дом 10, корпус 2'),
+            normalize_address('москва ленинский пр-т 10 к 2'),
+        )
+        self.assertNotEqual(normalize_address('Москва, ул. Ленина 1'), normalize_address('Москва, ул. Ленина 11'))
+
+    def test_keeps_order_of_building_numbers(self):
+        self.assertNotEqual(
+            normalize_address('Москва, ул. Ленина, д. 10, корп. 2'),
+            normalize_address('Москва, ул. Ленина, д. 2, корп. 10'),
+        )
+        self.assertNotEqual(
+            normalize_address('Москва, ул. Ленина, д. 10, корп. 2'),
+            normalize_address('Москва, ул. Ленина, д. 10, стр. 2'),
+        )
+        self.assertEqual(
+            normalize_address('Москва, ул. Ленина, д. 10, корп. 2'),
+            normalize_address('ул Ленина 10 к2, Москва'),
+        )
+
+
+class FetchLocationsCoordinatesTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_coalesces_concurrent_lookups_of_same_address(self):
+        with StubGeocoderServer(delay=0.3) as geocoder, override_settings(YANDEX_GEOCODER_URL=geocoder.url):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(
+                    lambda _: fetch_locations_coordinates(['Москва, Арбат 2']),
+                    range(8),
+                ))
+
+        self.assertEqual(geocoder.requested_addresses, ['Москва, Арбат 2'])
+        self.assertEqual(
+            results,
+            [{'Москва, Арбат 2': geocoder.get_coordinates('Москва, Арбат 2')}] * 8,
+        )
+
+    def test_coalesces_lookups_of_differently_written_address(self):
+        addresses = ['Москва, Арбат 2', 'арбат 2, г. Москва']
+        with StubGeocoderServer(delay=0.3) as geocoder, override_settings(YANDEX_GEOCODER_URL=geocoder.url):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(lambda address: fetch_locations_coordinates([address]), addresses))
+
+        self.assertEqual(len(geocoder.requested_addresses), 1)
+        coordinates = geocoder.get_coordinates(geocoder.requested_addresses[0])
+        self.assertEqual(results, [{address: coordinates} for address in addresses])
+
+    def test_limits_requests_per_second(self):
+        addresses = [f'Москва, Арбат {number}' for number in range(12)]
+
+        with StubGeocoderServer() as geocoder:
+            with override_settings(YANDEX_GEOCODER_URL=geocoder.url, GEOCODER_RATE_LIMIT=5):
+                coordinates = fetch_locations_coordinates(addresses)
+
+        self.assertEqual(len(coordinates), 12)
+        self.assertLessEqual(max(Counter(int(request_time) for request_time in geocoder.requests_times).values()), 5)
+
+    def test_gives_up_on_slow_geocoder(self):
+        with StubGeocoderServer(delay=2) as geocoder:
+            with override_settings(YANDEX_GEOCODER_URL=geocoder.url, GEOCODER_TIMEOUT=0.2):
+                started_at = time.perf_counter()
+                coordinates = fetch_locations_coordinates(['Москва, Арбат 2'])
+
+        self.assertEqual(coordinates, {})
+        self.assertLess(time.perf_counter() - started_at, 1)
+
+
+@override_settings(LOCATION_TTL_DAYS=30, LOCATION_NOT_FOUND_TTL_DAYS=1)
+class RefreshLocationsTest(TestCase):
+    def test_refreshes_only_stale_locations(self):
+        today = timezone.localdate()
+        Location.objects.create(address='свежий', lat=1, lon=1)
+        Location.objects.create(address='старый', lat=1, lon=1)
+        Location.objects.create(address='нигде', lat=None, lon=None)
+        Location.objects.filter(address='старый').update(verified_at=today - datetime.timedelta(days=31))
+        Location.objects.filter(address='нигде').update(verified_at=today - datetime.timedelta(days=2))
+
+        with StubGeocoderServer(unknown_addresses={'нигде'}) as geocoder:
+            with override_settings(YANDEX_GEOCODER_URL=geocoder.url):
+                call_command('refresh_locations', stdout=StringIO())
+
+        self.assertCountEqual(geocoder.requested_addresses, ['старый', 'нигде'])
+        self.assertFalse(Location.objects.stale().exists())
+        self.assertEqual(
+            Location.objects.values_list('lat', 'lon').get(address='старый'),
+            geocoder.get_coordinates('старый'),
+        )
+
+
+class GridIndexTest(TestCase):
+    def test_matches_brute_force_search(self):
+        generator = random.Random(0)
+        points = [(key, generator.uniform(55.5, 56), generator.uniform(37.3, 37.9)) for key in range(300)]
+        grid = GridIndex(points, cell_km=2)
+        allowed_keys = {key for key, _, _ in points if key % 3}
+
+        for _ in range(20):
+            lat, lon = generator.uniform(55.5, 56), generator.uniform(37.3, 37.9)
+            distances = haversine_matrix([(lat, lon)], [(point_lat, point_lon) for _, point_lat, point_lon in points])[0]
+            expected = sorted(
+                (key, distance) for (key, _, _), distance in zip(points, distances)
+                if key in allowed_keys and distance <= 10
+            )
+            expected = sorted(expected, key=lambda item: item[1])[:5]
+
+            nearest = grid.nearest(lat, lon, limit=5, radius_km=10, allowed_keys=allowed_keys)
+
+            self.assertEqual([key for key, _ in nearest], [key for key, _ in expected])
+
+    def test_bounds_rings_by_farthest_cell(self):
+        generator = random.Random(0)
+        points = [(key, generator.uniform(55.5, 56), generator.uniform(37.3, 37.9)) for key in range(50)]
+        grid = GridIndex(points, cell_km=2)
+
+        for lat, lon in [(55.75, 37.6), (54, 36), (57, 39)]:
+            row, column = center = grid.get_cell(lat, lon)
+            farthest_ring = max(
+                max(abs(cell_row - row), abs(cell_column - column)) for cell_row, cell_column in grid.cells
+            )
+            self.assertEqual(grid.get_max_ring(center), farthest_ring)
+        self.assertEqual(GridIndex([]).get_max_ring((0, 0)), -1)
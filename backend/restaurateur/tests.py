@@ -1,3 +1,146 @@
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from foodcartapp.models import Order, OrderStatistics, Product, Restaurant, RestaurantMenuItem
+
+
+class ViewProductsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurants = [
+            Restaurant.objects.create(name=name, lat=55.75, lon=37.62) for name in ['Арбат', 'Тверская']
+        ]
+        self.product = Product.objects.create(name='Бургер', price=150, image='burger.jpg')
+        self.menu_item = RestaurantMenuItem.objects.create(restaurant=self.restaurants[1], product=self.product)
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def get_availability(self):
+        response = self.client.get('/manager/products/')
+        [(product, availability)] = response.context['products_with_restaurant_availability']
+        return product, availability
+
+    def test_shows_availability_in_restaurants_order(self):
+        product, availability = self.get_availability()
+
+        self.assertEqual(product, self.product)
+        self.assertEqual(availability, [False, True])
+
+    def test_updates_availability_after_menu_change(self):
+        self.get_availability()
+
+        self.menu_item.availability = False
+        self.menu_item.save()
+        RestaurantMenuItem.objects.create(restaurant=self.restaurants[0], product=self.product)
+
+        self.assertEqual(self.get_availability()[1], [True, False])
+
+
+class ViewStatisticsTest(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='Арбат', lat=55.75, lon=37.62)
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        OrderStatistics.objects.bulk_create([
+            OrderStatistics(hour=hour, restaurant=restaurant, status=Order.COOKING, orders_count=2, revenue=500),
+            OrderStatistics(hour=hour, status=Order.UNWATCHED, orders_count=1, revenue=150),
+            OrderStatistics(
+                hour=hour - datetime.timedelta(days=2),
+                restaurant=restaurant,
+                status=Order.COMPLETED,
+                orders_count=3,
+                revenue=900,
+            ),
+        ])
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_aggregates_rollups_for_period(self):
+        response = self.client.get('/manager/statistics/', {'days': 1})
+
+        self.assertEqual(
+            [(name, statistics['orders_count']) for name, statistics in response.context['statuses']],
+            [('Необработанный', 1), ('Готовится', 2), ('Доставляется', 0), ('Выполнен', 0)],
+        )
+        self.assertEqual(
+            [(name, statuses_counts) for name, statuses_counts, _ in response.context['restaurants']],
+            [('Арбат', [0, 2, 0, 0]), ('Не назначен', [1, 0, 0, 0])],
+        )
+        self.assertEqual([statistics['revenue'] for _, statistics in response.context['periods']], [650])
+
+
+@patch('restaurateur.views.ORDERS_PAGE_SIZE', 2)
+@patch('restaurateur.views.ORDERS_EXPORT_CHUNK_SIZE', 2)
+class ViewOrdersTest(TestCase):
+    def setUp(self):
+        statuses = [Order.COOKING, Order.UNWATCHED, Order.DELIVERING, Order.UNWATCHED, Order.COOKING]
+        self.orders = [
+            Order.objects.create(
+                firstname='Иван',
+                lastname='Петров',
+                phonenumber='+79291234567',
+                address='Москва, Тверская 1',
+                status=status,
+            )
+            for status in statuses
+        ]
+        self.orders.sort(key=lambda order: (order.status, order.id))
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def get_orders_ids(self, response):
+        return [order['id'] for order in response.context['orders']]
+
+    def test_walks_pages_with_cursor(self):
+        orders_ids = []
+        params = {}
+        while True:
+            response = self.client.get('/manager/orders/', params)
+            orders_ids.extend(self.get_orders_ids(response))
+            if not response.context['next_cursor']:
+                break
+            params = {'after': response.context['next_cursor']}
+
+        self.assertEqual(orders_ids, [order.id for order in self.orders])
+
+    def test_keeps_page_boundary_when_status_changes(self):
+        first_page = self.client.get('/manager/orders/')
+        first_order = Order.objects.get(id=self.get_orders_ids(first_page)[0])
+        first_order.status = Order.COMPLETED
+        first_order.save()
+
+        second_page = self.client.get('/manager/orders/', {'after': first_page.context['next_cursor']})
+
+        self.assertEqual(self.get_orders_ids(second_page), [order.id for order in self.orders[2:4]])
+
+    def test_ignores_malformed_cursor(self):
+        first_page_ids = [order.id for order in self.orders[:2]]
+        for cursor in ['', 'abc', '1-', '-3', '1-abc']:
+            response = self.client.get('/manager/orders/', {'after': cursor})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.get_orders_ids(response), first_page_ids)
+
+    def test_excludes_completed_orders(self):
+        completed_order = Order.objects.create(
+            firstname='Анна',
+            lastname='Смирнова',
+            phonenumber='+79291234568',
+            address='Москва, Арбат 2',
+            status=Order.COMPLETED,
+        )
+
+        for params in [{}, {'after': f'{Order.DELIVERING}-0'}, {'export': ''}]:
+            response = self.client.get('/manager/orders/', params)
+
+            self.assertNotIn(completed_order.id, self.get_orders_ids(response))
+
+    def test_exports_every_active_order(self):
+        response = self.client.get('/manager/orders/', {'export': ''})
 
-# Create your tests here.
+        self.assertEqual(self.get_orders_ids(response), [order.id for order in self.orders])
+        self.assertIsNone(response.context['next_cursor'])
@@ -1,13 +1,25 @@
+import datetime
+
 from django import forms
 from django.contrib.auth import authenticate, login, views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q, Sum
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views import View
 
-from foodcartapp.models import Order, OrderItem, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.availability import get_availability_matrix
+from foodcartapp.models import Order, OrderCandidateRestaurant, OrderStatistics, Product, Restaurant
+from foodcartapp.orders_statistics import get_statistics_hour
 from foodcartapp.views import get_restaurants_definitions
-from geocoder.models import Location
+
+
+ORDERS_PAGE_SIZE = 100
+PRODUCTS_PAGE_SIZE = 50
+ORDERS_EXPORT_CHUNK_SIZE = 500
+STATISTICS_PERIODS_DAYS = [1, 7, 30]
 
 
 class Login(forms.Form):
@@ -75,24 +87,22 @@ def is_manager(user):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    availability_matrix = get_availability_matrix()
+    products = Product.objects.select_related('category').order_by('id')
+    products_page = Paginator(products, PRODUCTS_PAGE_SIZE).get_page(request.GET.get('page'))
 
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+    products_with_restaurant_availability = [
+        (product, availability_matrix.get_product_availability(product.id))
+        for product in products_page
+    ]
 
     return render(
         request,
         template_name='products_list.html',
         context={
             'products_with_restaurant_availability': products_with_restaurant_availability,
-            'restaurants': restaurants,
+            'restaurants_names': [name for _, name in availability_matrix.restaurants],
+            'products_page': products_page,
         }
     )
 
@@ -107,53 +117,133 @@ def view_restaurants(request):
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-    restaurants_menu_items = (
-        RestaurantMenuItem.objects
-                          .filter(availability=True)
-                          .prefetch_related('product', 'restaurant')
+def view_statistics(request):
+    days = request.GET.get('days', '')
+    days = int(days) if days.isdigit() and int(days) in STATISTICS_PERIODS_DAYS else STATISTICS_PERIODS_DAYS[1]
+    statistics = (
+        OrderStatistics.objects
+                       .filter(hour__gt=get_statistics_hour(timezone.now()) - datetime.timedelta(days=days))
+                       .order_by()
     )
-    orders_items = (
-        OrderItem.objects
-                 .with_costs()
-                 .prefetch_related('order', 'product')
-                 .exclude(order__status='CM')
-                 .order_by('order__status', 'order__id')
+    totals = {'orders_count': Sum('orders_count'), 'revenue': Sum('revenue')}
+
+    statuses_statistics = {
+        row['status']: row for row in statistics.values('status').annotate(**totals)
+    }
+    restaurants_statistics = {}
+    for row in statistics.values('restaurant__name', 'status').annotate(**totals):
+        restaurant_statistics = restaurants_statistics.setdefault(
+            row['restaurant__name'] or 'Не назначен',
+            {'statuses': {}, 'orders_count': 0, 'revenue': 0},
+        )
+        restaurant_statistics['statuses'][row['status']] = row['orders_count']
+        restaurant_statistics['orders_count'] += row['orders_count']
+        restaurant_statistics['revenue'] += row['revenue']
+
+    return render(
+        request,
+        template_name='statistics.html',
+        context={
+            'days': days,
+            'periods_days': STATISTICS_PERIODS_DAYS,
+            'statuses': [
+                (name, statuses_statistics.get(status, {'orders_count': 0, 'revenue': 0}))
+                for status, name in Order.ORDER_STATUSES
+            ],
+            'restaurants': [
+                (
+                    name,
+                    [restaurant_statistics['statuses'].get(status, 0) for status, _ in Order.ORDER_STATUSES],
+                    restaurant_statistics,
+                )
+                for name, restaurant_statistics in sorted(restaurants_statistics.items())
+            ],
+            'periods': get_statistics_periods(statistics.values('hour').annotate(**totals).order_by('-hour'), days),
+        }
+    )
+
+
+def get_statistics_periods(hours_statistics, days):
+    if days == 1:
+        return [
+            (timezone.localtime(row['hour']).strftime('%d.%m.%Y %H:00'), row)
+            for row in hours_statistics
+        ]
+    days_statistics = {}
+    for row in hours_statistics:
+        day_statistics = days_statistics.setdefault(
+            timezone.localtime(row['hour']).strftime('%d.%m.%Y'),
+            {'orders_count': 0, 'revenue': 0},
+        )
+        day_statistics['orders_count'] += row['orders_count']
+        day_statistics['revenue'] += row['revenue']
+    return list(days_statistics.items())
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders(request):
+    export = 'export' in request.GET
+    orders = Order.objects.active().order_by('status', 'id')
+
+    cursor = parse_orders_cursor(request.GET.get('after', ''))
+    if cursor:
+        status, order_id = cursor
+        orders = orders.filter(Q(status__gt=status) | Q(status=status, id__gt=order_id))
+
+    next_cursor = None
+    if export:
+        orders = iterate_orders_with_candidates(orders)
+    else:
+        orders = list(prefetch_orders_candidates(orders)[:ORDERS_PAGE_SIZE + 1])
+        if len(orders) > ORDERS_PAGE_SIZE:
+            orders = orders[:ORDERS_PAGE_SIZE]
+            next_cursor = format_orders_cursor(orders[-1].status, orders[-1].id)
+
+    return render(
+        request,
+        template_name='order_items.html',
+        context={
+            'orders': [serialize_order(order) for order in orders],
+            'export': export,
+            'next_cursor': next_cursor,
+        }
     )
-    restaurants_addresses = {restaurant_menu_item.restaurant.address for restaurant_menu_item in restaurants_menu_items}
-    orders_addresses = {order_item.order.address for order_item in orders_items}
-    addresses = restaurants_addresses | orders_addresses
-    locations = Location.objects.filter(address__in=addresses)
-    orders_for_page = generate_orders_for_page(restaurants_menu_items, orders_items, locations)
 
-    return render(request, template_name='order_items.html', context={'orders': orders_for_page})
+
+def prefetch_orders_candidates(orders):
+    candidates = OrderCandidateRestaurant.objects.select_related('restaurant').order_by('distance', 'restaurant__name')
+    return (
+        orders.select_related('cooking_restaurant')
+              .prefetch_related(Prefetch('candidate_restaurants', queryset=candidates))
+    )
 
 
-def generate_orders_for_page(restaurants_menu_items, orders_items, locations):
-    orders_for_page = []
-    order = order_restaurants = None
+def iterate_orders_with_candidates(orders):
+    cursor = None
+    while True:
+        chunk = orders
+        if cursor:
+            status, order_id = cursor
+            chunk = chunk.filter(Q(status__gt=status) | Q(status=status, id__gt=order_id))
+        chunk = list(prefetch_orders_candidates(chunk)[:ORDERS_EXPORT_CHUNK_SIZE])
+        yield from chunk
+        if len(chunk) < ORDERS_EXPORT_CHUNK_SIZE:
+            return
+        cursor = chunk[-1].status, chunk[-1].id
 
-    for order_item in orders_items:
-        if not order or order_item.order.id != order.id:
-            if order:
-                restaurants_definitions = get_restaurants_definitions(order.address, order_restaurants, locations)
-                orders_for_page.append(serialize_order(order, order_cost, restaurants_definitions))
 
-            order = order_item.order
-            order_cost = order_item.cost
-            order_restaurants = get_order_item_restaurants(restaurants_menu_items, order_item)
-        else:
-            order_cost += order_item.cost
-            order_restaurants = order_restaurants & get_order_item_restaurants(restaurants_menu_items, order_item)
+def parse_orders_cursor(cursor):
+    status, _, order_id = cursor.partition('-')
+    if not status or not order_id.isdigit():
+        return None
+    return status, int(order_id)
 
-    if order:
-        restaurants_definitions = get_restaurants_definitions(order.address, order_restaurants, locations)
-        orders_for_page.append(serialize_order(order, order_cost, restaurants_definitions))
 
-    return orders_for_page
+def format_orders_cursor(status, order_id):
+    return f'{status}-{order_id}'
 
 
-def serialize_order(order, order_cost, restaurants):
+def serialize_order(order):
     return {
         'id': order.id,
         'status': order.get_status_display(),
@@ -163,18 +253,7 @@ def serialize_order(order, order_cost, restaurants):
         'phonenumber': order.phonenumber,
         'address': order.address,
         'comment': order.comment,
-        'cost': order_cost,
+        'cost': order.total_cost,
         'cooking_restaurant': order.cooking_restaurant.name if order.cooking_restaurant else '',
-        'restaurants': restaurants,
-    }
-
-
-def get_order_item_restaurants(restaurants_menu_items, order_item):
-    if order_item.order.cooking_restaurant:
-        return set()
-
-    return {
-        restaurants_menu_item.restaurant
-        for restaurants_menu_item in restaurants_menu_items
-        if restaurants_menu_item.product.id == order_item.product.id
+        'restaurants': get_restaurants_definitions(order, order.candidate_restaurants.all()),
     }
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+
+
+class LazyHealthCheckMixin:
+    """Проверяет постоянное соединение с базой перед первым SQL-запросом после простоя.
+
+    Django 3.2 не умеет проверять соединение перед повторным использованием
+    (`CONN_HEALTH_CHECKS` появился в 4.1), поэтому соединение, оборванное
+    сервером между запросами, давало бы ошибку первому же запросу. Проверка
+    `SELECT 1` выполняется, только когда соединение простаивало дольше
+    `DB_CONN_HEALTH_CHECK_IDLE` секунд и действительно понадобилось, так что
+    запросы к сайту без SQL и частые запросы её не оплачивают.
+    """
+
+    last_used_at = 0
+
+    def connect(self):
+        super().connect()
+        self.last_used_at = time.monotonic()
+
+    def _cursor(self, name=None):
+        now = time.monotonic()
+        if (
+            self.connection is not None
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.in_atomic_block
+            and now - self.last_used_at > settings.DB_CONN_HEALTH_CHECK_IDLE
+            and not self.is_usable()
+        ):
+            self.close()
+        self.last_used_at = now
+        return super()._cursor(name)
@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from ..health_checks import LazyHealthCheckMixin
+
+
+class DatabaseWrapper(LazyHealthCheckMixin, base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянных соединений после простоя."""
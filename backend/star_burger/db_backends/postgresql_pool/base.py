@@ -0,0 +1,71 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.extras
+from django.conf import settings
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from psycopg2.pool import ThreadedConnectionPool
+
+
+pools = {}
+pools_lock = threading.Lock()
+connections_released_at = {}
+
+
+def get_pool(alias, conn_params, pool_settings):
+    with pools_lock:
+        if alias not in pools:
+            pools[alias] = ThreadedConnectionPool(
+                pool_settings.get('MIN_CONNECTIONS', 1),
+                pool_settings['MAX_CONNECTIONS'],
+                **conn_params,
+            )
+        return pools[alias]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    Django по-прежнему «закрывает» соединение в конце запроса, но оно
+    возвращается в пул и достаётся следующему запросу без нового
+    подключения к серверу. Размер пула задаётся ключом `POOL` в настройках базы.
+    """
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, conn_params, self.settings_dict['POOL'])
+        connection = self.get_healthy_connection(pool)
+
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def get_healthy_connection(self, pool):
+        """Взять соединение из пула; простоявшее дольше `DB_CONN_HEALTH_CHECK_IDLE` секунд — проверить."""
+        if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            return pool.getconn()
+
+        for _ in range(pool.maxconn):
+            connection = pool.getconn()
+            released_at = connections_released_at.pop(id(connection), None)
+            if released_at is None or time.monotonic() - released_at <= settings.DB_CONN_HEALTH_CHECK_IDLE:
+                return connection
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                connection.rollback()
+                return connection
+            except psycopg2.Error:
+                pool.putconn(connection, close=True)
+        return pool.getconn()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                connections_released_at[id(self.connection)] = time.monotonic()
+                pools[self.alias].putconn(self.connection)
@@ -0,0 +1,275 @@
+import asyncio
+import bisect
+import contextvars
+import glob
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+METRICS = {
+    'starburger_view_duration_seconds': ('Время обработки запроса', DURATION_BUCKETS),
+    'starburger_view_queries': ('Количество SQL-запросов за запрос', COUNT_BUCKETS),
+    'starburger_view_queries_duration_seconds': ('Время SQL-запросов за запрос', DURATION_BUCKETS),
+    'starburger_view_geocoder_calls': ('Количество обращений к геокодеру за запрос', COUNT_BUCKETS),
+    'starburger_view_response_bytes': ('Размер ответа', SIZE_BUCKETS),
+}
+
+current_measurement = contextvars.ContextVar('current_measurement', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, histogram_sum, count):
+        self.counts = [own_count + other_count for own_count, other_count in zip(self.counts, counts)]
+        self.sum += histogram_sum
+        self.count += count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(dict)
+
+    def observe(self, view, values):
+        with self.lock:
+            for metric, value in values.items():
+                histograms = self.histograms[metric]
+                if view not in histograms:
+                    histograms[view] = Histogram(METRICS[metric][1])
+                histograms[view].observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric, (description, buckets) in METRICS.items():
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} histogram')
+                for view, histogram in sorted(self.histograms[metric].items()):
+                    cumulative_count = 0
+                    for bucket, bucket_count in zip([*buckets, '+Inf'], histogram.counts):
+                        cumulative_count += bucket_count
+                        lines.append(f'{metric}_bucket{{view="{view}",le="{bucket}"}} {cumulative_count}')
+                    lines.append(f'{metric}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{view="{view}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self):
+        with self.lock:
+            return {
+                metric: {
+                    view: [histogram.counts, histogram.sum, histogram.count]
+                    for view, histogram in histograms.items()
+                }
+                for metric, histograms in self.histograms.items()
+            }
+
+    def merge(self, dump):
+        with self.lock:
+            for metric, histograms in dump.items():
+                for view, (counts, histogram_sum, count) in histograms.items():
+                    if view not in self.histograms[metric]:
+                        self.histograms[metric][view] = Histogram(METRICS[metric][1])
+                    self.histograms[metric][view].merge(counts, histogram_sum, count)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+registry = MetricsRegistry()
+metrics_flusher_lock = threading.Lock()
+metrics_flusher_pid = None
+process_metrics_name = None
+
+
+def start_metrics_flusher():
+    """Запустить в процессе фоновый поток, который раз в `METRICS_FLUSH_INTERVAL` секунд сохраняет его метрики.
+
+    Поток запускается заново в процессе, порождённом через fork, поэтому
+    у каждого воркера свой файл метрик.
+    """
+    global metrics_flusher_pid, process_metrics_name
+
+    with metrics_flusher_lock:
+        if metrics_flusher_pid == os.getpid():
+            return
+        metrics_flusher_pid = os.getpid()
+        process_metrics_name = f'metrics-{metrics_flusher_pid}-{uuid.uuid4().hex[:8]}.json'
+        threading.Thread(target=flush_metrics_periodically, name='metrics-flusher', daemon=True).start()
+
+
+def flush_metrics_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        save_process_metrics()
+
+
+def save_process_metrics():
+    """Сохранить гистограммы процесса в `METRICS_DIR`, чтобы страница метрик сложила их со всех процессов."""
+    if not settings.METRICS_DIR:
+        return
+    path = os.path.join(settings.METRICS_DIR, process_metrics_name)
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as metrics_file:
+        json.dump(registry.dump(), metrics_file)
+    os.replace(temporary_path, path)
+
+
+def render_all_processes_metrics():
+    if not settings.METRICS_DIR:
+        return registry.render()
+
+    start_metrics_flusher()
+    save_process_metrics()
+    all_processes_registry = MetricsRegistry()
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as metrics_file:
+                all_processes_registry.merge(json.load(metrics_file))
+        except FileNotFoundError:
+            continue
+    return all_processes_registry.render()
+
+
+def count_geocoder_calls(calls_count):
+    measurement = current_measurement.get()
+    if measurement is not None:
+        measurement.geocoder_calls += calls_count
+
+
+def time_query(execute, sql, params, many, context):
+    measurement = current_measurement.get()
+    if measurement is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.queries_count += 1
+        measurement.queries_duration += time.perf_counter() - started_at
+
+
+def install_queries_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_queries_timer)
+
+
+class Measurement:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.queries_count = 0
+        self.queries_duration = 0
+        self.geocoder_calls = 0
+
+    def observe(self, request, response):
+        resolver_match = request.resolver_match
+        if not resolver_match:
+            return
+        view = getattr(resolver_match.func, 'view_class', resolver_match.func)
+        values = {
+            'starburger_view_duration_seconds': time.perf_counter() - self.started_at,
+            'starburger_view_queries': self.queries_count,
+            'starburger_view_queries_duration_seconds': self.queries_duration,
+            'starburger_view_geocoder_calls': self.geocoder_calls,
+        }
+        if not response.streaming:
+            values['starburger_view_response_bytes'] = len(response.content)
+        registry.observe(f'{view.__module__}.{view.__name__}', values)
+        if settings.METRICS_DIR and metrics_flusher_pid != os.getpid():
+            start_metrics_flusher()
+
+
+class InstrumentationMiddleware:
+    """Замеряет выборку запросов к сайту: время, SQL-запросы, обращения к геокодеру и размер ответа.
+
+    Замеряется доля запросов `METRICS_SAMPLE_RATE`, остальные проходят почти
+    без накладных расходов. Замер передаётся через contextvars, поэтому
+    учитываются и SQL-запросы асинхронных представлений, выполняемые в
+    потоках `sync_to_async`. Гистограммы хранятся в памяти процесса, а если
+    задан `METRICS_DIR`, фоновый поток периодически сохраняет их в файл
+    процесса в этом каталоге; отдаются они в формате Prometheus
+    представлением `metrics_view`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all():
+            install_queries_timer(connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        measurement = Measurement()
+        token = current_measurement.set(measurement)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_measurement.reset(token)
+        measurement.observe(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        measurement = Measurement()
+        token = current_measurement.set(measurement)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_measurement.reset(token)
+        measurement.observe(request, response)
+        return response
+
+
+def metrics_view(request):
+    """Метрики всех процессов сайта для Prometheus.
+
+    Страница доступна только с токеном `METRICS_TOKEN` в заголовке
+    `Authorization: Bearer ...`; без настроенного токена её нет. Адресу
+    клиента не доверяем: за nginx он у всех запросов 127.0.0.1.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    expected_authorization = f'Bearer {settings.METRICS_TOKEN}'
+    if not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), expected_authorization):
+        return HttpResponseForbidden()
+    return HttpResponse(render_all_processes_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -15,6 +15,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
 YANDEX_GEO_API_KEY = env('YANDEX_GEO_API_KEY')
+YANDEX_GEOCODER_URL = env('YANDEX_GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+GEOCODER_CACHE_SIZE = env.int('GEOCODER_CACHE_SIZE', 10000)
+GEOCODER_CACHE_TIMEOUT = env.int('GEOCODER_CACHE_TIMEOUT', 60 * 60)
+GEOCODER_FAILURE_CACHE_TIMEOUT = env.int('GEOCODER_FAILURE_CACHE_TIMEOUT', 60)
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 3)
+GEOCODER_RATE_LIMIT = env.int('GEOCODER_RATE_LIMIT', 20)
+LOCATION_TTL_DAYS = env.int('LOCATION_TTL_DAYS', 180)
+LOCATION_NOT_FOUND_TTL_DAYS = env.int('LOCATION_NOT_FOUND_TTL_DAYS', 7)
+RESTAURANTS_EXACT_DISTANCE_TOP = env.int('RESTAURANTS_EXACT_DISTANCE_TOP', 3)
+RESTAURANTS_GRID_CELL_KM = env.float('RESTAURANTS_GRID_CELL_KM', 2)
+RESTAURANTS_SEARCH_LIMIT = env.int('RESTAURANTS_SEARCH_LIMIT', 10)
+RESTAURANTS_SEARCH_RADIUS_KM = env.float('RESTAURANTS_SEARCH_RADIUS_KM', 50)
+ORDER_PROCESSING_TIMEOUT = env.int('ORDER_PROCESSING_TIMEOUT', 5 * 60)
+ORDER_PROCESSING_MAX_ATTEMPTS = env.int('ORDER_PROCESSING_MAX_ATTEMPTS', 5)
+AUTO_ASSIGN_RESTAURANTS = env.bool('AUTO_ASSIGN_RESTAURANTS', False)
+ASSIGNMENT_LOAD_PENALTY_KM = env.float('ASSIGNMENT_LOAD_PENALTY_KM', 1)
+ASSIGNMENT_MAX_RESTAURANT_LOAD = env.int('ASSIGNMENT_MAX_RESTAURANT_LOAD', 0)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -33,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'star_burger.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,9 +59,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'rollbar.contrib.django.middleware.RollbarNotifierMiddlewareExcluding404',
 ]
+if DEBUG:
+    MIDDLEWARE.insert(-1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
 ROOT_URLCONF = 'star_burger.urls'
 
@@ -85,9 +105,35 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 DATABASES = {
-    'default': dj_database_url.config(default=env('DATABASE_URL'))
+    'default': dj_database_url.config(
+        default=env('DATABASE_URL'),
+        conn_max_age=env.int('DB_CONN_MAX_AGE', 60),
+        conn_health_checks=env.bool('DB_CONN_HEALTH_CHECKS', True),
+    )
 }
 
+DB_CONN_HEALTH_CHECK_IDLE = env.float('DB_CONN_HEALTH_CHECK_IDLE', 10)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['ENGINE'] = 'star_burger.db_backends.postgresql'
+
+DB_POOL_MAX_CONNECTIONS = env.int('DB_POOL_MAX_CONNECTIONS', 0)
+if DB_POOL_MAX_CONNECTIONS and DATABASES['default']['ENGINE'] == 'star_burger.db_backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'star_burger.db_backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_CONNECTIONS': env.int('DB_POOL_MIN_CONNECTIONS', 1),
+            'MAX_CONNECTIONS': DB_POOL_MAX_CONNECTIONS,
+        },
+    })
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+# кэши, собранные по данным БД, живут не дольше этого времени: с кэшем в памяти
+# процесса другие процессы не видят их сбросов и узнают об изменениях только так
+DERIVED_CACHE_TIMEOUT = env.int('DERIVED_CACHE_TIMEOUT', 30)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -119,6 +165,11 @@ INTERNAL_IPS = [
     '127.0.0.1'
 ]
 
+METRICS_SAMPLE_RATE = env.float('METRICS_SAMPLE_RATE', 0.1)
+METRICS_TOKEN = env('METRICS_TOKEN', '')
+METRICS_DIR = env('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', 5)
+
 
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "assets"),
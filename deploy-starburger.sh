@@ -13,6 +13,8 @@ python_path="./venv/bin/python"
 $python_path -m pip install -r requirements.txt
 $python_path manage.py collectstatic --no-input
 $python_path manage.py migrate --no-input
+$python_path manage.py publish_snapshots
+$python_path manage.py recompute_candidates
 echo "Backend assembled - OK"
 
 systemctl daemon-reload